@@ -6,54 +6,114 @@ Versione: 1.0
 
 Descrizione:
 Questa applicazione consente di recuperare, filtrare e analizzare i dati disponibili su dati.gov.it.
-Utilizza le API CKAN per ottenere la lista dei pacchetti e permette di selezionare e visualizzare i dati in formato CSV ed Excel.
+Utilizza le API CKAN per ottenere la lista dei pacchetti e permette di selezionare e visualizzare i dati in formato CSV.
 Inoltre, fornisce funzionalità di visualizzazione geografica tramite Folium.    
 """
+import atexit
+import os
+import re
 import requests
 import pandas as pd
-import json
-from io import StringIO
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Sessione HTTP condivisa: riutilizza le connessioni TCP/TLS tra le richieste
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+atexit.register(SESSION.close)
+
+# Se True salva anche i dettagli del pacchetto selezionato in DatiSelezionati.json
+DEBUG = False
+
+# Timeout (connessione, lettura) in secondi per ogni richiesta
+TIMEOUT = (5, 30)
+# Timeout più ampio per i download dei CSV letti in streaming
+STREAM_TIMEOUT = (5, 60)
+
+# Numero di righe lette per blocco: limita la memoria usata durante il parsing
+CHUNKSIZE = 200_000
+
+# Colonne usate dall'analisi degli incidenti e relativi tipi: evitano l'inferenza dei tipi.
+# Tutte le altre colonne vengono comunque lette, perché finiscono in output.csv.gz
+DTYPES = {
+    'Latitudine': 'float32',
+    'Longitudine': 'float32',
+    'N. veicoli coinvolti': 'Int16',
+    'Condizioni traffico': 'category'
+}
+
+# Lettura in streaming del CSV con parametri aggiuntivi per pd.read_csv
+def read_csv_stream(url, **kwargs):
+    # Il CSV viene letto in streaming a blocchi, senza caricare l'intero file in memoria
+    with SESSION.get(url, stream=True, timeout=STREAM_TIMEOUT) as response:
+        if response.status_code == 200:
+            # Decomprime l'eventuale codifica gzip/deflate del trasferimento
+            response.raw.decode_content = True
+            reader = pd.read_csv(response.raw, encoding='utf-8', chunksize=CHUNKSIZE, **kwargs)
+            return pd.concat(reader, ignore_index=True)
+        else:
+            print(f"Errore durante il recupero dei dati: {response.status_code}")
+            return None
 
 # Controllo risposta ottenuta dalla richiesta effettuata
 def get_data_from_url(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.content.decode('utf-8')
-        df = pd.read_csv(StringIO(data))
-        return df
-    else:
-        print(f"Errore durante il recupero dei dati: {response.status_code}")
-        return None
+    # Legge il file completo, con i tipi già definiti per le colonne note (le assenti sono ignorate)
+    try:
+        return read_csv_stream(url, engine='c', dtype=DTYPES)
+    except ValueError:
+        # Valori non compatibili con i tipi attesi: nuova lettura con inferenza dei tipi
+        return read_csv_stream(url)
     
 # URL dell'API CKAN, con metodo package_list, importa lista dei pacchetti su Python 
 url  = "https://dati.gov.it/opendata/api/3/action/package_list"
 
+# File con l'ETag dell'ultima lista pacchetti salvata in DatiGovIt.json (cache su disco)
+ETAG_FILE = "DatiGovIt.etag"
+
+# Se la lista è già in cache si chiede al server di inviarla solo se è cambiata
+headers = {}
+if os.path.exists("DatiGovIt.json") and os.path.exists(ETAG_FILE):
+    with open(ETAG_FILE, "r") as f:
+        headers['If-None-Match'] = f.read().strip()
+
 # Richiesta GET  all'URL per ottenere i pacchetti
-response = requests.get(url)
+response = SESSION.get(url, headers=headers, timeout=TIMEOUT)
+
+if response.status_code == 304:
+    # Lista invariata (304 Not Modified): si riusa il file in cache senza riscriverlo
+    with open("DatiGovIt.json", "rb") as f:
+        data = orjson.loads(f.read())
+else:
+    # Conversione risposta alla richiesta in formato JSON in dizionario comprensibile da Python
+    data = orjson.loads(response.content) 
 
-# Conversione risposta alla richiesta in formato JSON in dizionario comprensibile da Python
-data = json.loads(response.text) 
+    # Visualizzare tipo dizionario memorizzato nella variabile
+    type(data)  
 
-# Visualizzare tipo dizionario memorizzato nella variabile
-type(data)  
+    # Formattazione informazioni ottenute in tipo json (orjson restituisce bytes)
+    text = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) 
 
-# Formattazione informazioni ottenute in tipo json
-text = json.dumps(data, sort_keys = True, indent = 4) 
+    # Creazione file di tipo json per lettura comprensibile della lista dati disponibili
+    with open("DatiGovIt.json", "wb") as f:
+        f.write(text) 
 
-# Creazione file di tipo json per lettura comprensibile della lista dati disponibili
-with open("DatiGovIt.json", "w") as f:
-    f.write(text) 
+    # Salvataggio dell'ETag per le richieste condizionali successive
+    etag = response.headers.get('ETag')
+    if etag:
+        with open(ETAG_FILE, "w") as f:
+            f.write(etag)
 
 # Utilizzo di uan parola chiave per filtrare dati
 word_key = input("Inserire una parola chiave per filtrare i dati: ")
 
-# Apertura file e caricamento dati
-with open("DatiGovIt.json", "r") as f:
-    data = json.load(f)
-
 # Ottieni la lista di stringhe dalla chiave 'result' e filtraggio lista con parola chiave
 lista_stringhe = data['result']
-lista_filtrata = [s for s in lista_stringhe if word_key in s]
+# Più parole chiave separate da spazi vengono unite in un'unica espressione regolare compilata
+parole_chiave = word_key.split() or [word_key]
+pattern = re.compile('|'.join(map(re.escape, parole_chiave)))
+lista_filtrata = list(filter(pattern.search, lista_stringhe))
 
 #Controlla se la lista filtrata è vuota e restituisce
 #un messaggio altrimenti crea una lista dati filtrata
@@ -61,8 +121,8 @@ if not lista_filtrata:
     print(f"Nessun risultato trovato per la parola chiave '{word_key}'")
 else:
     # Salva la lista filtrata in un nuovo file json
-    with open("DatiGovItFiltrati.json", "w") as f:
-        json.dump(lista_filtrata, f, indent=4)
+    with open("DatiGovItFiltrati.json", "wb") as f:
+        f.write(orjson.dumps(lista_filtrata, option=orjson.OPT_INDENT_2))
 
 # Inserimento con input da tastiera dati selezionati e Apertura URL specifico 
 #dalla lista DatiFiltrati
@@ -72,7 +132,7 @@ datiselezionati = input("Inserisci il nome del dato che desideri selezionare: ")
 url = f"https://dati.gov.it/opendata/api/3/action/package_show?id={datiselezionati}"
 
 # Richiesta GET  all'URL per ottenere i pacchetti ( con selezione parametri se necessaria)
-response = requests.get(url)
+response = SESSION.get(url, timeout=TIMEOUT)
 
 #Controllo che la risposta ricevuta dal server sia corretta altrimeti exit
 if response.status_code != 200:
@@ -80,43 +140,30 @@ if response.status_code != 200:
     exit()
 
 # Conversione della risposta richiesta in formato JSON per dizionario comprensibile da Python
-data1 = json.loads(response.text) 
-
-# Formattazione informazioni ottenute in tipo json
-text = json.dumps(data1, sort_keys=True, indent=4) 
+data1 = orjson.loads(response.content) 
 
 # Visualizzare tipo dizionario memorizzato nella variabile
 type(data1) 
 
-# Creazione file di tipo json per lettura comprensibile della lista dati disponibili
-with open("DatiSelezionati.json", "w") as f:
-    f.write(text) 
+# Creazione file di tipo json per lettura comprensibile dei dettagli (solo in modalità DEBUG)
+if DEBUG:
+    with open("DatiSelezionati.json", "wb") as f:
+        f.write(orjson.dumps(data1, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)) 
 
-# Tranformazione file json in un DataFrame pandas per manipolazione dati
+# Visualizzazione di tutte le colonne dei DataFrame pandas
 pd.set_option("display.max_columns", None)
 
-# Assegna il risultato alla variabile df
-df = pd.json_normalize(data1['result'])
-
-# Apertura file e caricamento dati
-with open("DatiSelezionati.json", "r") as f:
-    data = json.load(f)
-
-# Inizializza l'URL come una stringa vuota
-url = ""
-
-# Itera su ogni risorsa nella lista 'resources' finchè il formato termina con .csv
-for resource in data['result']['resources']:
-    print(resource)
-    if resource['format'] == 'CSV' and resource['url'].endswith('.csv'):
-        url = resource['url']
-        break
+# Primo URL di una risorsa in formato CSV che termina con .csv, altrimenti stringa vuota
+# (le risorse vengono lette direttamente dal dizionario già ottenuto dalla risposta)
+risorse = data1['result']['resources']
+url = next((r['url'] for r in risorse
+            if r.get('format') == 'CSV' and r.get('url', '').lower().endswith('.csv')), "")
 # Sè url è uguale alla risposta ottenuta salva i dati altrimenti stampa errore
 if url:
     df = get_data_from_url(url) 
     if df is not None:
-        df.to_csv('output.csv', index=False)
-        print("Dati salvati in output.csv")
+        df.to_csv('output.csv.gz', index=False, compression='gzip', chunksize=100_000)
+        print("Dati salvati in output.csv.gz")
 else:
     print("Nessun URL di file CSV trovato.")
 
@@ -125,12 +172,8 @@ if not url:
     url = input("Inserisci l'URL del file CSV manualmente: ")
     df = get_data_from_url(url)
     if df is not None:
-        df.to_csv("output.csv", index=False)
-        print("Dati salvati in output.csv") 
-
-        #Salva il DataFrame in un secondo file Excel
-        df.to_excel('output.xlsx', index=False)
-        print("Dati salvati in output.xlsx")
+        df.to_csv("output.csv.gz", index=False, compression='gzip', chunksize=100_000)
+        print("Dati salvati in output.csv.gz") 
 else:
     print(f"Errore durante il recupero dei dati: {response.status_code}")
 
@@ -138,7 +181,8 @@ Condizioni = df[(df[ 'Condizioni traffico'] == 'Intenso') & (df['N. veicoli coin
 
 Condizioni = Condizioni.dropna(axis=1, how='all')
 
-Condizioni.to_excel('Condizioni.xlsx', index=False)
+# File intermedio in formato Parquet (colonnare e compresso): molto più veloce di Excel
+Condizioni.to_parquet('Condizioni.parquet', engine='pyarrow', compression='zstd', index=False)
 
 # Importa la libreria folium
 import folium
@@ -147,8 +191,8 @@ import folium
 mappa_incidenti = folium.Map(location=[Condizioni['Latitudine'].mean(), Condizioni['Longitudine'].mean()], zoom_start=13)
 
 # Aggiungi un marcatore per ogni punto di incidente
-for idx, riga in Condizioni.iterrows():
-    folium.Marker([riga['Latitudine'], riga['Longitudine']]).add_to(mappa_incidenti)
+for lat, lon in zip(Condizioni['Latitudine'].to_numpy(), Condizioni['Longitudine'].to_numpy()):
+    folium.Marker([lat, lon]).add_to(mappa_incidenti)
 
 # Visualizza la mappa
 mappa_incidenti.save('mappa_incidenti.html')
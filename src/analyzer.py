@@ -4,53 +4,132 @@ This module provides functionality to analyze road accident data,
 filter based on traffic conditions and create interactive maps of accidents.
 """
 
+import numpy as np # Vectorized coordinate handling
 import pandas as pd # Data manipulation
 import folium # Interactive map creation
+from folium.plugins import HeatMap # Single-layer rendering for large point sets
 import os # File path management
-from config import OUTPUT_DIR, DEFAULT_ZOOM # Global configurations
+from functools import lru_cache # Caching of column lookups shared across datasets
+from typing import Any, Dict, Optional, Tuple # Type hints for documentation
+from config import ( # Global configurations
+    OUTPUT_DIR, DEFAULT_ZOOM, MAP_HEATMAP_THRESHOLD, MAP_HTML_FILE, COORDINATE_DECIMALS
+)
+
+# Accepted (lowercase) names for coordinate columns, in order of preference
+COORDINATE_VARIATIONS = {
+    'lat': ['latitudine', 'latitude', 'lat', 'y_coord', 'y'],
+    'lon': ['longitudine', 'longitude', 'lon', 'x_coord', 'x']
+}
+
+
+@lru_cache(maxsize=128)
+def _lower_columns(columns: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Map lowercase column names to the original ones (cached per set of columns)"""
+    return {str(col).lower(): col for col in columns}
+
+
+@lru_cache(maxsize=128)
+def _find_coordinate_columns(columns: Tuple[Any, ...]) -> Tuple[Optional[str], Optional[str]]:
+    """Resolve latitude and longitude column names (cached per set of columns)"""
+    columns_lower = _lower_columns(columns)
+    lat_col = next((columns_lower[var] for var in COORDINATE_VARIATIONS['lat'] if var in columns_lower), None)
+    lon_col = next((columns_lower[var] for var in COORDINATE_VARIATIONS['lon'] if var in columns_lower), None)
+    return lat_col, lon_col
+
+
+def _coordinate_arrays(df: pd.DataFrame, lat_col: str, lon_col: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return latitude and longitude as float arrays plus the mask of finite pairs"""
+    lat = df[lat_col].to_numpy(dtype='float64', na_value=np.nan)
+    lon = df[lon_col].to_numpy(dtype='float64', na_value=np.nan)
+    return lat, lon, np.isfinite(lat) & np.isfinite(lon)
+
+
+def _clean_center(lat: np.ndarray, lon: np.ndarray, mask: np.ndarray) -> Tuple[float, float]:
+    """
+    Center of the valid coordinates.
+    The sums are reduced directly under the mask, without first copying the valid points.
+    """
+    count = np.count_nonzero(mask)
+    center_lat = np.add.reduce(lat, where=mask) / count
+    center_lon = np.add.reduce(lon, where=mask) / count
+    return float(center_lat), float(center_lon)
 
 
 class IncidentAnalyzer:
     """Analyzes road accident data and creates visualizations"""
     
-    def __init__(self, dataframe: pd.DataFrame): # Constructor initializes analyzer with a DataFrame
+    def __init__(self, dataframe: Optional[pd.DataFrame] = None):
+        """
+        Initialize the analyzer.
+        The same instance can analyze many datasets: every method accepts a DataFrame
+        and falls back to the one given here when it is omitted.
+        """
         self.df = dataframe
     
+    def _resolve_df(self, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Return the DataFrame to work on (the given one or the default one)"""
+        return self.df if df is None else df
+    
+    def find_coordinate_columns(self, df: Optional[pd.DataFrame] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Latitude and longitude column names of a dataset (None if not found)"""
+        return _find_coordinate_columns(tuple(self._resolve_df(df).columns))
+    
+    @property
+    def coord_cols(self) -> Tuple[Optional[str], Optional[str]]:
+        """Latitude and longitude column names of the default dataset"""
+        return self.find_coordinate_columns()
+    
     def filter_traffic_conditions(self, 
                                  traffic_condition: str = 'Intenso', 
-                                 min_vehicles: int = 2) -> pd.DataFrame:
+                                 min_vehicles: int = 2,
+                                 df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Filter accidents based on traffic conditions and number of vehicles involved
         
         Args:
             traffic_condition: Traffic condition to filter
             min_vehicles: Minimum number of vehicles involved
+            df: DataFrame to filter (if None, the default one is used)
             
         Returns:
             Filtered DataFrame
         """
         try:
-            # Check existence of necessary columns
-            traffic_col = 'Condizioni traffico'
-            vehicles_col = 'N. veicoli coinvolti'
+            df = self._resolve_df(df)
+            columns_lower = _lower_columns(tuple(df.columns))
+            
+            # Check existence of necessary columns (case-insensitive)
+            traffic_col = columns_lower.get('condizioni traffico')
+            vehicles_col = columns_lower.get('n. veicoli coinvolti')
             
-            if traffic_col not in self.df.columns:
-                print(f"Column '{traffic_col}' not found in dataset")
+            if traffic_col is None:
+                print("Column 'Condizioni traffico' not found in dataset")
                 return pd.DataFrame()
             
-            if vehicles_col not in self.df.columns:
-                print(f"Column '{vehicles_col}' not found in dataset")
+            if vehicles_col is None:
+                print("Column 'N. veicoli coinvolti' not found in dataset")
                 return pd.DataFrame()
             
+            # Compare traffic conditions on categorical codes: a single integer comparison per row
+            traffic = df[traffic_col]
+            if not isinstance(traffic.dtype, pd.CategoricalDtype):
+                traffic = traffic.astype('category')
+            categories = traffic.cat.categories
+            
+            # Build the combined filter mask in place on numpy arrays
+            mask = np.zeros(len(df), dtype=bool)
+            if traffic_condition in categories:
+                np.equal(traffic.cat.codes.to_numpy(), categories.get_loc(traffic_condition), out=mask)
+                vehicles = df[vehicles_col].to_numpy(dtype='float64', na_value=np.nan)
+                np.logical_and(mask, vehicles > min_vehicles, out=mask)
+            
             # Apply filters on traffic conditions and number of vehicles involved
-            filtered_df = self.df[
-                (self.df[traffic_col] == traffic_condition) & 
-                (self.df[vehicles_col] > min_vehicles)
-            ]
+            filtered_df = df.iloc[mask]
             
             # Clean result. 
             # Remove missing values like (NaN, None, Null) from DataFrame columns
-            filtered_df = filtered_df.dropna(axis=1, how='all') # Remove only completely empty columns
+            keep_columns = filtered_df.notna().to_numpy().any(axis=0) # Keep columns with at least one value
+            filtered_df = filtered_df.iloc[:, keep_columns]
             
             print(f"Found {len(filtered_df)} accidents with {traffic_condition} traffic and more than {min_vehicles} vehicles involved")
             
@@ -60,11 +139,21 @@ class IncidentAnalyzer:
             print(f"Error during data filtering: {e}")
             return pd.DataFrame()
     
+    def create_map(self) -> folium.Map:
+        """
+        Create an empty map to be shared by several datasets.
+        Each dataset is added as a separate layer with `create_incidents_map(..., incidents_map=...)`
+        and the map is written once with `save_map`.
+        """
+        return folium.Map(zoom_start=DEFAULT_ZOOM)
+    
     def create_incidents_map(self, 
                            filtered_df: pd.DataFrame,
                            lat_col: str = None,
                            lon_col: str = None,
-                           filename: str = 'mappa_incidenti.html') -> bool:
+                           filename: str = MAP_HTML_FILE,
+                           incidents_map: Optional[folium.Map] = None,
+                           layer_name: str = "Accidents") -> bool:
         """
         Create an accident map using Folium
         
@@ -73,33 +162,20 @@ class IncidentAnalyzer:
             lat_col: Name of latitude column (if None, will search for it)
             lon_col: Name of longitude column (if None, will search for it)
             filename: Output HTML file name
+            incidents_map: Shared map to add the accidents layer to (if None, a new map is created and saved)
+            layer_name: Name of the accidents layer
             
         Returns:
-            True if map was created successfully
+            True if map (or layer) was created successfully
         """
         try:
             if filtered_df.empty:
                 print("No data available to create map")
                 return False
             
-            # If columns not provided, try to find them
+            # If columns not provided, try to find them (lookup cached per set of columns)
             if lat_col is None or lon_col is None:
-                coordinate_variations = {
-                    'lat': ['latitudine', 'latitude', 'lat', 'y_coord', 'y'],
-                    'lon': ['longitudine', 'longitude', 'lon', 'x_coord', 'x']
-                }
-                
-                df_columns_lower = {col.lower(): col for col in filtered_df.columns}
-                
-                for lat_var in coordinate_variations['lat']:
-                    if lat_var in df_columns_lower:
-                        lat_col = df_columns_lower[lat_var]
-                        break
-                
-                for lon_var in coordinate_variations['lon']:
-                    if lon_var in df_columns_lower:
-                        lon_col = df_columns_lower[lon_var]
-                        break
+                lat_col, lon_col = self.find_coordinate_columns(filtered_df)
             
             if lat_col is None or lon_col is None:
                 print(f"❌ Coordinate columns not found. Available: {list(filtered_df.columns)}")
@@ -107,79 +183,140 @@ class IncidentAnalyzer:
             
             print(f"✅ Using columns: lat={lat_col}, lon={lon_col}")
             
-            # Remove rows with missing coordinates
-            valid_coords = filtered_df.dropna(subset=[lat_col, lon_col])
+            # Pull the coordinate columns once and keep only finite pairs with a single mask
+            lat, lon, mask = _coordinate_arrays(filtered_df, lat_col, lon_col)
             
-            if valid_coords.empty:
+            if not mask.any():
                 print("No valid coordinates found to create map")
                 return False
             
-            # Use average coordinates to automatically center the map.
-            center_lat = valid_coords[lat_col].mean()
-            center_lon = valid_coords[lon_col].mean()
+            # Center is computed before compressing the arrays (and only for standalone maps)
+            if incidents_map is None:
+                center_lat, center_lon = _clean_center(lat, lon, mask)
+            
+            # Quantize valid points to float32 on a grid of COORDINATE_DECIMALS decimals (about 1 m)
+            # and merge points falling on the same spot: one marker per location instead of per accident
+            points = np.column_stack((lat[mask], lon[mask])).astype(np.float32)
+            points = np.round(points, COORDINATE_DECIMALS)
+            points, first_rows, counts = np.unique(points, axis=0, return_index=True, return_counts=True)
+            index = filtered_df.index.to_numpy()[mask][first_rows]
+            
+            # All points are collected in a single layer that is attached to the map once
+            incidents_layer = folium.FeatureGroup(name=layer_name)
+            
+            if len(points) > MAP_HEATMAP_THRESHOLD:
+                # Too many points for individual markers: render a single heatmap layer,
+                # weighting each location by the number of accidents merged into it
+                HeatMap(np.column_stack((points, counts)).tolist()).add_to(incidents_layer)
+            else:
+                """
+                 Iteration over the unique valid locations, for each one
+                 create a marker on the layer with the specified coordinates.
+                 The marker popup shows the accident index, or the number of accidents at that location.
+                 Zipping the numpy arrays avoids building a Series per row as iterrows does.
+                """
+                for idx, (point_lat, point_lon), count in zip(index, points.tolist(), counts):
+                    incidents_layer.add_child(folium.Marker(
+                        [point_lat, point_lon],
+                        popup=f"Accident {idx}" if count == 1 else f"{count} accidents"
+                    ))
+            
+            if incidents_map is not None:
+                # Shared map: only add the layer, the map is saved once by the caller
+                incidents_layer.add_to(incidents_map)
+                print(f"🗺️ Layer '{layer_name}' added with {len(points)} locations")
+                return True
             
+            # Use average coordinates to automatically center the map.
             print(f"🗺️ Map center: ({center_lat}, {center_lon})")
             
             # Create map by transforming coordinates into a Folium object
             incidents_map = folium.Map(
-                location=[center_lat, center_lon], 
+                location=[center_lat, center_lon],
                 zoom_start=DEFAULT_ZOOM
             )
+            incidents_layer.add_to(incidents_map)
             
-            """
-             Iteration over each row of the filtered DataFrame, for each row with valid coordinates,
-             create a marker on the map with the specified coordinates.
-             The marker popup shows the accident index.
-            """
-            for idx, row in valid_coords.iterrows():
-                folium.Marker(
-                    [row[lat_col], row[lon_col]],
-                    popup=f"Accident {idx}"
-                ).add_to(incidents_map)
-            
-            # Save map to HTML file
-            # Ensure the output directory exists
-            os.makedirs(OUTPUT_DIR, exist_ok=True)
-            
-            filepath = os.path.join(OUTPUT_DIR, filename)
-            
-            # Convert to absolute path to avoid issues
-            filepath = os.path.abspath(filepath)
-            
-            # Save the map
-            incidents_map.save(filepath)
-            
-            # Debug: Print file details
-            file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
-            print(f"🗺️ Map saved: {filepath}")
-            print(f"   File size: {file_size} bytes")
-            print(f"   File exists: {os.path.exists(filepath)}")
-            print(f"   Total markers: {len(valid_coords)}")
+            print(f"   Total markers: {len(points)}")
+            return self._save_map_file(incidents_map, filename)
+        
+        except Exception as e:
+            print(f"Error during map creation: {e}")
+            return False
+    
+    def save_map(self, incidents_map: folium.Map, filename: str = MAP_HTML_FILE) -> bool:
+        """
+        Save a shared map built with `create_map`
+        Adds a control to toggle the dataset layers and fits the view on all of them.
+        
+        Returns:
+            True if map was saved successfully
+        """
+        try:
+            folium.LayerControl().add_to(incidents_map)
             
-            return True
+            # Fit the view on the union of all layers, when their bounds are known
+            bounds = incidents_map.get_bounds()
+            if None not in bounds[0] and None not in bounds[1]:
+                incidents_map.fit_bounds(bounds)
             
+            return self._save_map_file(incidents_map, filename)
+        
         except Exception as e:
             print(f"Error during map creation: {e}")
             return False
     
-    def get_data_summary(self) -> dict:
+    def _save_map_file(self, incidents_map: folium.Map, filename: str) -> bool:
+        """Save map to HTML file in the output directory"""
+        # Ensure the output directory exists
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        
+        filepath = os.path.join(OUTPUT_DIR, filename)
+        
+        # Convert to absolute path to avoid issues
+        filepath = os.path.abspath(filepath)
+        
+        # Save the map
+        incidents_map.save(filepath)
+        
+        # Debug: Print file details
+        file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        print(f"🗺️ Map saved: {filepath}")
+        print(f"   File size: {file_size} bytes")
+        print(f"   File exists: {os.path.exists(filepath)}")
+        
+        return True
+    
+    def get_data_summary(self, df: Optional[pd.DataFrame] = None) -> dict:
         """Returns a data summary"""
+        df = self._resolve_df(df)
         return {
-            'total_records': len(self.df),
-            'columns': list(self.df.columns),
-            'missing_data': self.df.isnull().sum().to_dict(),
-            'data_types': self.df.dtypes.to_dict()
+            'total_records': len(df),
+            'columns': list(df.columns),
+            'missing_data': df.isnull().sum().to_dict(),
+            'data_types': df.dtypes.to_dict()
         }
     
-    def analyze(self) -> dict:
+    def analyze(self,
+                df: Optional[pd.DataFrame] = None,
+                incidents_map: Optional[folium.Map] = None,
+                layer_name: str = "Accidents",
+                create_map: bool = True) -> dict:
         """
         Perform complete analysis on the dataset
         
+        Args:
+            df: DataFrame to analyze (if None, the default one is used)
+            incidents_map: Shared map to add the dataset layer to (if None, a map file is saved)
+            layer_name: Name of the dataset layer on the map
+            create_map: If False, coordinates are detected and counted but no map is built
+            
         Returns:
             Dictionary with analysis results
         """
+        df = self._resolve_df(df)
         results = {
-            'summary': self.get_data_summary(),
+            'summary': self.get_data_summary(df),
             'filtered_data': None,
             'map_created': False,
             'has_coordinates': False,
@@ -188,26 +325,8 @@ class IncidentAnalyzer:
         }
         
         try:
-            # Check if dataset has coordinate columns (latitude and longitude)
-            lat_col = None
-            lon_col = None
-            coordinate_variations = {
-                'lat': ['latitudine', 'latitude', 'lat', 'y_coord', 'y'],
-                'lon': ['longitudine', 'longitude', 'lon', 'x_coord', 'x']
-            }
-            
-            # Find coordinate columns (case-insensitive)
-            df_columns_lower = {col.lower(): col for col in self.df.columns}
-            
-            for lat_var in coordinate_variations['lat']:
-                if lat_var in df_columns_lower:
-                    lat_col = df_columns_lower[lat_var]
-                    break
-            
-            for lon_var in coordinate_variations['lon']:
-                if lon_var in df_columns_lower:
-                    lon_col = df_columns_lower[lon_var]
-                    break
+            # Check if dataset has coordinate columns (latitude and longitude, case-insensitive)
+            lat_col, lon_col = self.find_coordinate_columns(df)
             
             # If coordinates found, update results and create map with ALL geographic data
             if lat_col and lon_col:
@@ -219,21 +338,23 @@ class IncidentAnalyzer:
                 # Create map with ALL geographic data in the dataset
                 # Pass the column names to avoid redundant searching
                 try:
-                    map_created = self.create_incidents_map(self.df, lat_col=lat_col, lon_col=lon_col)
-                    results['map_created'] = map_created
+                    if create_map:
+                        map_created = self.create_incidents_map(df, lat_col=lat_col, lon_col=lon_col,
+                                                                incidents_map=incidents_map, layer_name=layer_name)
+                        results['map_created'] = map_created
                     
                     # Count valid points on the map
-                    valid_coords = self.df.dropna(subset=[lat_col, lon_col])
-                    results['total_points_on_map'] = len(valid_coords)
-                    
+                    _, _, mask = _coordinate_arrays(df, lat_col, lon_col)
+                    results['total_points_on_map'] = int(np.count_nonzero(mask))
+                
                 except Exception as e:
                     print(f"Error creating map: {e}")
                     results['map_created'] = False
             else:
-                print(f"❌ No coordinate columns found. Available columns: {list(self.df.columns)}")
+                print(f"❌ No coordinate columns found. Available columns: {list(df.columns)}")
             
             # Filter data for traffic conditions (separate from map creation)
-            filtered_df = self.filter_traffic_conditions()
+            filtered_df = self.filter_traffic_conditions(df=df)
             
             if not filtered_df.empty:
                 results['filtered_data'] = {
@@ -246,3 +367,11 @@ class IncidentAnalyzer:
             print(f"Error in analyze: {e}")
         
         return results
+
+
+def analyze_without_map(df: pd.DataFrame) -> dict:
+    """
+    Analyze a dataset without building its map, e.g. on a worker thread:
+    the map layers are then added by the caller, to a single shared map.
+    """
+    return IncidentAnalyzer().analyze(df, create_map=False)
@@ -7,11 +7,16 @@ including error handling to ensure that the application continues to run even if
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
+import numpy as np
 import os
 import sys
-from analyzer import IncidentAnalyzer
-from services import DataService, CkanApiService
-from config import OUTPUT_DIR, OUTPUT_CSV_FILE, MAP_HTML_FILE
+import hashlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# analyzer (folium), services (requests) and file_manager are imported where they are used:
+# the page renders first and the heavy modules are loaded on the first search or analysis
+from config import (OUTPUT_DIR, OUTPUT_PARQUET_FILE, MAP_HTML_FILE, MAX_ANALYSIS_WORKERS,
+                    MAX_CONCURRENT_DOWNLOADS, DATAFRAME_PREVIEW_ROWS)
 
 # Define th route for the application
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,53 +30,187 @@ def format_summary_results(summary):
         return pd.DataFrame()
     
     # Convert to readable table
-    summary_data = {
-        'Metric': [],
-        'Value': []
-    }
+    rows = []
     
     for key, value in summary.items():
         if key == 'missing_data':
             # Format missing data count
-            missing_count = sum([1 for v in value.values() if v > 0]) if isinstance(value, dict) else 0
-            summary_data['Metric'].append('Missing Data Entries')
-            summary_data['Value'].append(missing_count)
+            if isinstance(value, dict):
+                counts = np.fromiter(value.values(), dtype=np.int64, count=len(value))
+                missing_count = int(np.count_nonzero(counts > 0))
+            elif isinstance(value, pd.Series):
+                missing_count = int((value > 0).sum())
+            else:
+                missing_count = 0
+            rows.append(('Missing Data Entries', missing_count))
         elif key == 'data_types':
             # Count data types
             if isinstance(value, dict):
-                summary_data['Metric'].append('Data Columns')
-                summary_data['Value'].append(len(value))
+                rows.append(('Data Columns', len(value)))
         elif key == 'columns':
             # List columns
             if isinstance(value, list):
-                summary_data['Metric'].append('Column Names')
-                summary_data['Value'].append(', '.join([str(c)[:30] for c in value[:5]]) + (f'... (+{len(value)-5} more)' if len(value) > 5 else ''))
+                rows.append(('Column Names', ', '.join([str(c)[:30] for c in value[:5]]) + (f'... (+{len(value)-5} more)' if len(value) > 5 else '')))
         else:
             # Generic key-value pair
-            summary_data['Metric'].append(str(key).replace('_', ' ').title())
-            summary_data['Value'].append(str(value))
+            rows.append((str(key).replace('_', ' ').title(), str(value)))
     
-    return pd.DataFrame(summary_data)
+    return pd.DataFrame(rows, columns=['Metric', 'Value'])
 
 def format_filtered_data(filtered_data):
     """Convert filtered data to readable format"""
     if not filtered_data:
         return None
     
-    filtered_info = {
-        'Metric': [],
-        'Value': []
-    }
+    rows = []
     
     for key, value in filtered_data.items():
         if key == 'sample' and isinstance(value, dict):
-            filtered_info['Metric'].append('Sample Records')
-            filtered_info['Value'].append(f"{len(value)} records")
+            rows.append(('Sample Records', f"{len(value)} records"))
         else:
-            filtered_info['Metric'].append(str(key).replace('_', ' ').title())
-            filtered_info['Value'].append(str(value))
+            rows.append((str(key).replace('_', ' ').title(), str(value)))
+    
+    return pd.DataFrame(rows, columns=['Metric', 'Value']) if rows else None
+
+def build_results_table(packages):
+    """Build the search results table (one tuple per package, no per-row dicts)"""
+    rows = [
+        (idx, pkg.get('title', 'N/A'),
+         pkg['notes'][:100] + '...' if pkg.get('notes') else 'No description',
+         len(pkg.get('resources') or ()))
+        for idx, pkg in enumerate(packages)
+    ]
+    return pd.DataFrame.from_records(rows, columns=['Select', 'Title', 'Notes', 'Resources'])
+
+def read_map_html():
+    """Read the last saved map HTML file (None if not available)"""
+    map_path = os.path.join(OUTPUT_DIR, MAP_HTML_FILE)
+    try:
+        with open(map_path, "r", encoding='utf-8', errors='ignore') as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+@st.cache_data(show_spinner=False)
+def _read_map(path, mtime):
+    """Read a map HTML file, cached until the file modification time changes"""
+    with open(path, "r", encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+# Possible locations of the map file, resolved once (the absolute path is only
+# checked when it is not the same file as the relative one)
+MAP_PATHS = list(dict.fromkeys([
+    os.path.join(OUTPUT_DIR, MAP_HTML_FILE),  # ./output/mappa_incidenti.html
+    os.path.abspath(os.path.join(OUTPUT_DIR, MAP_HTML_FILE)),  # Absolute path
+    os.path.join("src", OUTPUT_DIR, MAP_HTML_FILE),  # ./src/output/mappa_incidenti.html
+]))
+
+def render_map():
+    """Render the last map (from session state, or from disk), returning whether one was shown"""
+    # Map HTML kept in session state by the last analysis: no need to read it from disk
+    if st.session_state.map_html:
+        components.html(st.session_state.map_html, height=500)
+        return True
     
-    return pd.DataFrame(filtered_info) if filtered_info['Metric'] else None
+    # Try multiple possible locations for the map file
+    for map_path in MAP_PATHS:
+        if os.path.exists(map_path):
+            try:
+                map_html = _read_map(map_path, os.path.getmtime(map_path))
+                if map_html.strip():
+                    st.success(f"✅ Mappa caricata da: {map_path}")
+                    components.html(map_html, height=500)
+                    return True
+            except Exception as e:
+                st.warning(f"Errore nel caricare la mappa da {map_path}: {str(e)}")
+    return False
+
+def save_output_data(df):
+    """Save the analyzed data as Parquet (compact and fast to read back)"""
+    from file_manager import FileManager
+    return FileManager().save_dataframe_parquet(df, OUTPUT_PARQUET_FILE, OUTPUT_DIR)
+
+def _frame_cache_key(df):
+    """
+    Cache key of a DataFrame: shape, columns and a digest of every row hash.
+    Hashing the rows is vectorized and much cheaper than the gzipped CSV it keys;
+    the digest (unlike a sum) also changes when the rows are reordered.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return df.shape, tuple(df.columns), hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_cache_key})
+def csv_download_bytes(df):
+    """Gzipped CSV of a DataFrame for the download button, computed once per frame"""
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False, compression='gzip')
+    return buffer.getvalue()
+
+def _fetch_and_process(package):
+    """
+    Download and clean the CSV dataset of a package.
+    Runs in a worker thread, so it never calls Streamlit: returns (package, processed_data, error).
+    The source_package column is added to the combined data, not to each dataset.
+    """
+    from services import DataService
+    try:
+        dataset = DataService.retrieve_dataset(package)
+        if dataset is None or dataset.empty:
+            return package, None, f"⚠️ No CSV data found for package: {package['title']}"
+        
+        processed_data = DataService.process_dataset(dataset)
+        if processed_data is None or processed_data.empty:
+            return package, None, f"⚠️ No valid data after processing for package: {package['title']}"
+        
+        return package, processed_data, None
+    except Exception as e:
+        return package, None, f"❌ Error processing package {package['title']}: {str(e)}"
+
+@st.cache_resource(show_spinner=False)
+def get_ckan_service():
+    """CKAN service shared by all reruns (it uses the pooled HTTP session of services)"""
+    from services import CkanApiService
+    return CkanApiService()
+
+@st.cache_resource(show_spinner=False)
+def get_data_service():
+    """Data service shared by all reruns"""
+    from services import DataService
+    return DataService()
+
+class EmptyResultError(Exception):
+    """
+    Raised by the cached loaders when a request fails or returns nothing.
+    st.cache_data does not store exceptions, so the next call retries instead of
+    reusing the empty result for the whole TTL.
+    """
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_search(keyword):
+    """Search CKAN packages, reusing the results of previous searches with the same keyword"""
+    packages = get_ckan_service().search_packages(keyword)
+    if not packages:
+        raise EmptyResultError(f"No datasets found for '{keyword}'")
+    return packages
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_dataset(package_id, _package):
+    """Retrieve the CSV dataset of a package, cached per package id (the package dict is not hashed)"""
+    dataset = get_data_service().retrieve_dataset(_package)
+    if dataset is None or dataset.empty:
+        raise EmptyResultError(f"No CSV data found for package {package_id}")
+    return dataset
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def analyze_dataset(package_id, dataset):
+    """
+    Analyze a dataset and return the results together with the map HTML.
+    Cached per package id and dataset content: repeated analyses skip the filter and map build.
+    """
+    from analyzer import IncidentAnalyzer
+    analysis_results = IncidentAnalyzer().analyze(dataset)
+    map_html = read_map_html() if analysis_results.get('map_created') else None
+    return analysis_results, map_html
     
 # Configuration of the Streamlit application
 st.set_page_config(page_title="Open Data Analysis", layout="wide")
@@ -90,33 +229,41 @@ if 'selected_packages' not in st.session_state:
     st.session_state.selected_packages = []
 if 'selected_package_data' not in st.session_state:
     st.session_state.selected_package_data = pd.DataFrame()
+if 'map_html' not in st.session_state:
+    st.session_state.map_html = None
+if 'package_results' not in st.session_state:
+    st.session_state.package_results = []
+if 'results_table' not in st.session_state:
+    st.session_state.results_table = None
 
 # Sidebar for user input
 st.sidebar.title("Open Data Analysis")
 keyword = st.sidebar.text_input("Enter a keyword to search for datasets", "incidenti stradali")
 search_button = st.sidebar.button("🔍 Search Datasets")
+show_debug = st.sidebar.checkbox("Show debug info", key="debug_info")
 
 # Logic to handle the search
 if search_button:
     # Reset previous search results AND session state
     st.session_state.search_results = []
+    st.session_state.results_table = None
     st.session_state.selected_packages = []
     st.session_state.all_data = pd.DataFrame()
     st.session_state.analysis_done = False
     st.session_state.selected_package_data = pd.DataFrame()
+    st.session_state.map_html = None
+    st.session_state.package_results = []
     
     with st.spinner("Searching for datasets..."):
         try:
-            # Initialize services
-            ckan_service = CkanApiService()
-
-            # Search for packages based on the keyword
-            packages = ckan_service.search_packages(keyword)
-            if not packages:
-                st.warning("No datasets found for the given keyword.")
-            else:
-                st.session_state.search_results = packages
-                st.success(f"Found {len(packages)} datasets!")
+            # Search for packages based on the keyword (cached per keyword, empty results are not cached)
+            packages = _cached_search(keyword)
+            st.session_state.search_results = packages
+            # Built once per search, not on every rerun
+            st.session_state.results_table = build_results_table(packages)
+            st.success(f"Found {len(packages)} datasets!")
+        except EmptyResultError:
+            st.warning("No datasets found for the given keyword.")
         except Exception as e:
             st.error(f"Error during search: {str(e)}")
 
@@ -131,18 +278,10 @@ if st.session_state.search_results:
     with tab1:
         st.subheader("Available Datasets")
         
-        # Create a table with search results
-        results_data = []
-        for idx, pkg in enumerate(st.session_state.search_results):
-            results_data.append({
-                'Select': idx,
-                'Title': pkg.get('title', 'N/A'),
-                'Notes': pkg.get('notes', '')[:100] + '...' if pkg.get('notes') else 'No description',
-                'Resources': len(pkg.get('resources', []))
-            })
-        
-        results_df = pd.DataFrame(results_data)
-        st.dataframe(results_df, use_container_width=True, hide_index=True)
+        # Table with search results (built when the search was run)
+        if st.session_state.results_table is None:
+            st.session_state.results_table = build_results_table(st.session_state.search_results)
+        st.dataframe(st.session_state.results_table, use_container_width=True, hide_index=True)
         
         # Selector for individual packages
         st.subheader("🎯 Select Dataset to Analyze")
@@ -158,20 +297,22 @@ if st.session_state.search_results:
         analyze_single = st.button("📊 Analyze Selected Dataset")
         
         if analyze_single and selected_option:
-            # Extract the actual title from the selected option (remove the index part)
-            selected_title = selected_option.split('] ', 1)[1] if '] ' in selected_option else selected_option
-            
-            # Find the selected package
-            selected_package = next(pkg for pkg in st.session_state.search_results if pkg['title'] == selected_title)
+            # Recover the package from the "[n] title" option index (titles may not be unique)
+            selected_idx = int(selected_option.split(']', 1)[0][1:]) - 1
+            selected_package = st.session_state.search_results[selected_idx]
+            selected_title = selected_package['title']
             
             with st.spinner(f"Analyzing {selected_title}..."):
                 try:
-                    data_service = DataService()
+                    data_service = get_data_service()
                     
-                    # Retrieve and process the dataset
-                    dataset = data_service.retrieve_dataset(selected_package)
+                    # Retrieve (cached per package id, failures are retried) and process the dataset
+                    try:
+                        dataset = _cached_dataset(selected_package.get('id', selected_title), selected_package)
+                    except EmptyResultError:
+                        dataset = None
                     
-                    if dataset is None or dataset.empty:
+                    if dataset is None:
                         st.error(f"❌ No CSV data found for this package")
                     else:
                         processed_data = data_service.process_dataset(dataset)
@@ -181,17 +322,19 @@ if st.session_state.search_results:
                         else:
                             # Save the selected package data
                             st.session_state.selected_package_data = processed_data
+                            st.session_state.analysis_timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
                             processed_data['source_package'] = selected_title
                             
-                            # Create analyzer
-                            analyzer = IncidentAnalyzer(processed_data)
-                            analysis_results = analyzer.analyze()
+                            # Analyze the dataset (cached per package and content, map HTML included)
+                            analysis_results, st.session_state.map_html = analyze_dataset(
+                                selected_package.get('id', selected_title), processed_data
+                            )
                             
                             # Display results
                             st.success(f"✅ Analysis completed for: {selected_title}")
                             
-                            # Debug: Show what was found
-                            if analysis_results.get('has_coordinates'):
+                            # Debug: Show what was found (only on request)
+                            if show_debug and analysis_results.get('has_coordinates'):
                                 coords = analysis_results.get('coordinate_columns', [])
                                 points = analysis_results.get('total_points_on_map', 0)
                                 st.write(f"🔍 Debug - Coordinate columns: {coords}")
@@ -232,14 +375,15 @@ if st.session_state.search_results:
                             else:
                                 st.info("ℹ️ No geographic coordinates (latitude/longitude) found in this dataset. Map generation skipped.")
                             
+                            # Render only a preview: the whole frame would be serialized to the browser
                             st.subheader("Full Dataset")
-                            st.dataframe(processed_data, use_container_width=True)
+                            st.dataframe(processed_data.head(DATAFRAME_PREVIEW_ROWS), use_container_width=True)
+                            if len(processed_data) > DATAFRAME_PREVIEW_ROWS:
+                                st.caption(f"Showing the first {DATAFRAME_PREVIEW_ROWS} of {len(processed_data)} rows (all rows are saved to {OUTPUT_PARQUET_FILE})")
                             
-                            # Save to CSV
-                            os.makedirs(OUTPUT_DIR, exist_ok=True)
-                            output_csv_path = os.path.join(OUTPUT_DIR, OUTPUT_CSV_FILE)
-                            processed_data.to_csv(output_csv_path, index=False)
-                            st.info(f"✅ Data saved to {OUTPUT_CSV_FILE}")
+                            # Save the data
+                            if save_output_data(processed_data):
+                                st.info(f"✅ Data saved to {OUTPUT_PARQUET_FILE}")
                             
                 except Exception as e:
                     st.error(f"Error analyzing package: {str(e)}")
@@ -252,109 +396,184 @@ if st.session_state.search_results:
             # Reset previous data
             st.session_state.all_data = pd.DataFrame()
             st.session_state.analysis_done = False
+            st.session_state.package_results = []
             
             with st.spinner("Processing all datasets..."):
                 try:
-                    # Initialize services
-                    data_service = DataService()
-
+                    from analyzer import IncidentAnalyzer, analyze_without_map
+                    
                     st.success(f"Found {len(st.session_state.search_results)} datasets. Processing...")
 
                     # Accumulator for all processed data
                     all_datasets = []
                     success_count = 0
                     
+                    # One analyzer and one map shared by all packages: each package becomes a map layer
+                    analyzer = IncidentAnalyzer()
+                    incidents_map = analyzer.create_map()
+                    map_layers = 0
+                    
                     # Process each package and analyze the data
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    for idx, package in enumerate(st.session_state.search_results):
-                        progress_bar.progress((idx + 1) / len(st.session_state.search_results))
-                        status_text.text(f"Processing {idx + 1}/{len(st.session_state.search_results)}: {package['title'][:50]}...")
+                    # Warnings and per-package results are collected and rendered once after the loops:
+                    # every Streamlit call inside them would be a separate message to the browser
+                    issues = []
+                    package_results = []
+                    
+                    # Download and clean the datasets on a thread pool (network bound);
+                    # UI updates stay on the main thread, as each download completes
+                    packages = st.session_state.search_results
+                    fetched = [None] * len(packages)
+                    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_DOWNLOADS, len(packages))) as executor:
+                        futures = {executor.submit(_fetch_and_process, package): idx
+                                   for idx, package in enumerate(packages)}
+                        for done, future in enumerate(as_completed(futures), 1):
+                            package, processed_data, error = future.result()
+                            progress_bar.progress(done / len(packages))
+                            status_text.text(f"Downloaded {done}/{len(packages)}: {package['title'][:50]}...")
+                            if error:
+                                issues.append(error)
+                            else:
+                                fetched[futures[future]] = processed_data
+                    
+                    # Keep the search order for the analysis and the map layers
+                    valid_packages = []
+                    for package, processed_data in zip(packages, fetched):
+                        if processed_data is not None:
+                            all_datasets.append(processed_data)
+                            valid_packages.append(package)
+                    success_count = len(all_datasets)
+                    
+                    # Analyze the independent datasets in parallel threads: the pandas/numpy work releases the GIL,
+                    # and threads neither fork the multithreaded server nor pickle each frame to a worker process
+                    analyses = [None] * len(all_datasets)
+                    if all_datasets:
+                        status_text.text(f"Analyzing {len(all_datasets)} datasets...")
+                        workers = min(MAX_ANALYSIS_WORKERS or os.cpu_count() or 1, len(all_datasets))
+                        with ThreadPoolExecutor(max_workers=workers) as executor:
+                            futures = {executor.submit(analyze_without_map, processed_data): idx
+                                       for idx, processed_data in enumerate(all_datasets)}
+                            for done, future in enumerate(as_completed(futures), 1):
+                                progress_bar.progress(done / len(futures))
+                                idx = futures[future]
+                                # A failing analysis must not abort the whole batch
+                                try:
+                                    analyses[idx] = future.result()
+                                except Exception as e:
+                                    issues.append(f"❌ Error analyzing package {valid_packages[idx]['title']}: {str(e)}")
+                    
+                    # Collect results in search order, adding each dataset as a layer of the shared map
+                    for package, processed_data, analysis_results in zip(valid_packages, all_datasets, analyses):
+                        if analysis_results is None:
+                            continue
                         
                         try:
-                            # Retrieve and process the dataset
-                            dataset = data_service.retrieve_dataset(package)
-                            
-                            # Check if dataset was retrieved successfully
-                            if dataset is None or dataset.empty:
-                                st.warning(f"⚠️ No CSV data found for package: {package['title']}")
-                                continue
-                            
-                            processed_data = data_service.process_dataset(dataset)
-                            
-                            # Check if processed data is valid
-                            if processed_data is None or processed_data.empty:
-                                st.warning(f"⚠️ No valid data after processing for package: {package['title']}")
-                                continue
-
-                            # Add package name column to track data source
-                            processed_data['source_package'] = package['title']
-                            all_datasets.append(processed_data)
-                            success_count += 1
-
-                            # Create analyzer with the processed data
-                            analyzer = IncidentAnalyzer(processed_data)
-                            
-                            # Analyze the processed data
-                            analysis_results = analyzer.analyze()
-
-                            # Display results
-                            with st.expander(f"✅ {package['title']} ({len(processed_data)} records)"):
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write("**Summary**")
-                                    summary_df = format_summary_results(analysis_results.get('summary', {}))
-                                    if not summary_df.empty:
-                                        st.dataframe(summary_df, use_container_width=True, hide_index=True)
-                                    
-                                    # Show geographic data indicator
-                                    if analysis_results.get('has_coordinates'):
-                                        coord_cols = analysis_results.get('coordinate_columns', [])
-                                        points_count = analysis_results.get('total_points_on_map', 0)
-                                        st.success(f"🗺️ Geographic: {', '.join(coord_cols)} ({points_count} points)")
-                                        if analysis_results.get('map_created'):
-                                            st.success("✅ Map created")
-                                        else:
-                                            st.warning("⚠️ Map generation failed")
-                                    else:
-                                        st.info("No geographic data")
-                                
-                                with col2:
-                                    st.write("**Filter Results**")
-                                    if analysis_results.get('filtered_data'):
-                                        filtered_df = format_filtered_data(analysis_results.get('filtered_data', {}))
-                                        if filtered_df is not None:
-                                            st.dataframe(filtered_df, use_container_width=True, hide_index=True)
-                                        else:
-                                            st.info("No matches")
-                                    else:
-                                        st.info("No filtered data")
-                                
-                                st.write("**Sample Data**")
-                                st.dataframe(processed_data.head(10), use_container_width=True)
+                            if analysis_results.get('has_coordinates'):
+                                lat_col, lon_col = analysis_results['coordinate_columns']
+                                analysis_results['map_created'] = analyzer.create_incidents_map(
+                                    processed_data, lat_col=lat_col, lon_col=lon_col,
+                                    incidents_map=incidents_map, layer_name=package['title']
+                                )
+                                if analysis_results['map_created']:
+                                    map_layers += 1
 
+                            package_results.append({
+                                'title': package['title'],
+                                'records': len(processed_data),
+                                'analysis': analysis_results,
+                                'sample': processed_data.head(10)
+                            })
+                        
                         except Exception as e:
-                            st.error(f"❌ Error processing package {package['title']}: {str(e)}")
+                            issues.append(f"❌ Error processing package {package['title']}: {str(e)}")
                     
                     status_text.empty()
                     progress_bar.empty()
                     
+                    st.session_state.package_results = package_results
+                    if issues:
+                        st.warning("\n\n".join(issues))
+                    
+                    # Save the shared map once, with a toggleable layer per package
+                    st.session_state.map_html = None
+                    if map_layers:
+                        if analyzer.save_map(incidents_map, MAP_HTML_FILE):
+                            st.session_state.map_html = read_map_html()
+                        else:
+                            st.warning("⚠️ Map generation failed")
+                    
                     # Combine all datasets and save
                     if all_datasets:
-                        combined_data = pd.concat(all_datasets, ignore_index=True)
+                        combined_data = pd.concat(all_datasets, ignore_index=True, sort=False)
+                        
+                        # Track the data source with a categorical column: one code per row
+                        # instead of a copy of the package title
+                        title_codes, titles = pd.factorize(pd.Series([p['title'] for p in valid_packages]))
+                        codes = np.repeat(title_codes, [len(df) for df in all_datasets])
+                        combined_data['source_package'] = pd.Categorical.from_codes(codes, categories=titles)
                         st.session_state.all_data = combined_data
                         st.session_state.analysis_done = True
+                        st.session_state.analysis_timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
                         
-                        # Save to CSV file
-                        os.makedirs(OUTPUT_DIR, exist_ok=True)
-                        output_csv_path = os.path.join(OUTPUT_DIR, OUTPUT_CSV_FILE)
-                        combined_data.to_csv(output_csv_path, index=False)
+                        # Save the combined data
+                        save_output_data(combined_data)
                         st.success(f"✅ Processed {success_count} datasets with {len(combined_data)} total records")
                     else:
                         st.warning("❌ No valid data was found in any of the packages.")
                 except Exception as e:
                     st.error(f"Error during processing: {str(e)}")
+        
+        # Per-package results: one overview table, details only for the chosen package
+        if st.session_state.package_results:
+            package_results = st.session_state.package_results
+            st.dataframe(pd.DataFrame(
+                [(r['title'], r['records'], r['analysis'].get('total_points_on_map', 0), r['analysis'].get('map_created', False))
+                 for r in package_results],
+                columns=['Package', 'Records', 'Points', 'Map']
+            ), use_container_width=True, hide_index=True)
+            
+            detail_idx = st.selectbox("Package details:", range(len(package_results)),
+                                      format_func=lambda idx: package_results[idx]['title'],
+                                      key="package_detail_selector")
+            result = package_results[detail_idx]
+            analysis_results = result['analysis']
+            
+            # Display results
+            with st.expander(f"✅ {result['title']} ({result['records']} records)", expanded=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("**Summary**")
+                    summary_df = format_summary_results(analysis_results.get('summary', {}))
+                    if not summary_df.empty:
+                        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+                    
+                    # Show geographic data indicator
+                    if analysis_results.get('has_coordinates'):
+                        coord_cols = analysis_results.get('coordinate_columns', [])
+                        points_count = analysis_results.get('total_points_on_map', 0)
+                        st.success(f"🗺️ Geographic: {', '.join(coord_cols)} ({points_count} points)")
+                        if analysis_results.get('map_created'):
+                            st.success("✅ Map created")
+                        else:
+                            st.warning("⚠️ Map generation failed")
+                    else:
+                        st.info("No geographic data")
+                
+                with col2:
+                    st.write("**Filter Results**")
+                    if analysis_results.get('filtered_data'):
+                        filtered_df = format_filtered_data(analysis_results.get('filtered_data', {}))
+                        if filtered_df is not None:
+                            st.dataframe(filtered_df, use_container_width=True, hide_index=True)
+                        else:
+                            st.info("No matches")
+                    else:
+                        st.info("No filtered data")
+                
+                st.write("**Sample Data**")
+                st.dataframe(result['sample'], use_container_width=True)
 
 # Divider
 st.markdown("---")
@@ -387,47 +606,22 @@ if st.session_state.analysis_done:
             st.subheader("📊 Dati Estratti")
             st.dataframe(display_data.head(20), use_container_width=True)
             
-            # Add download button
-            csv = display_data.to_csv(index=False)
+            # The full frame is sent to the browser only on request
+            if len(display_data) > 20 and st.checkbox("Show all rows", key="show_all_rows"):
+                st.dataframe(display_data, use_container_width=True)
+            
+            # Add download button (gzipped CSV, cached across reruns)
             st.download_button(
                 label="📥 Download CSV",
-                data=csv,
-                file_name=f"analysis_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
+                data=csv_download_bytes(display_data),
+                file_name=f"analysis_results_{st.session_state.get('analysis_timestamp', 'latest')}.csv.gz",
+                mime="application/gzip"
             )
         
         with col2:
             st.subheader("🗺️ Interactive Map")
             
-            # Try multiple possible locations for the map file
-            possible_paths = [
-                os.path.join(OUTPUT_DIR, MAP_HTML_FILE),  # ./output/mappa_incidenti.html
-                os.path.abspath(os.path.join(OUTPUT_DIR, MAP_HTML_FILE)),  # Absolute path
-                os.path.join("src", OUTPUT_DIR, MAP_HTML_FILE),  # ./src/output/mappa_incidenti.html
-            ]
-            
-            st.write("🔍 **Debug - Percorsi cercati:**")
-            for path in possible_paths:
-                exists = os.path.exists(path)
-                st.write(f"  - {path}: {'✅ Esiste' if exists else '❌ Non esiste'}")
-                if exists:
-                    size = os.path.getsize(path)
-                    st.write(f"    Dimensione: {size} bytes")
-            
-            map_loaded = False
-            for map_path in possible_paths:
-                if os.path.exists(map_path):
-                    try:
-                        with open(map_path, "r", encoding='utf-8', errors='ignore') as f:
-                            map_html = f.read()
-                        if map_html.strip():
-                            st.success(f"✅ Mappa caricata da: {map_path}")
-                            components.html(map_html, height=500)
-                            map_loaded = True
-                            break
-                    except Exception as e:
-                        st.warning(f"Errore nel caricare la mappa da {map_path}: {str(e)}")
-                        continue
+            map_loaded = render_map()
             
             if not map_loaded:
                 st.info("ℹ️ Mappa generata per i dataset con coordinate geografiche. Verifica che le coordinate siano presenti e valide.")
@@ -435,35 +629,7 @@ if st.session_state.analysis_done:
         # Show just the map if no data but map exists
         st.subheader("🗺️ Interactive Map")
         
-        # Try multiple possible locations for the map file
-        possible_paths = [
-            os.path.join(OUTPUT_DIR, MAP_HTML_FILE),  # ./output/mappa_incidenti.html
-            os.path.abspath(os.path.join(OUTPUT_DIR, MAP_HTML_FILE)),  # Absolute path
-            os.path.join("src", OUTPUT_DIR, MAP_HTML_FILE),  # ./src/output/mappa_incidenti.html
-        ]
-        
-        st.write("🔍 **Debug - Percorsi cercati:**")
-        for path in possible_paths:
-            exists = os.path.exists(path)
-            st.write(f"  - {path}: {'✅ Esiste' if exists else '❌ Non esiste'}")
-            if exists:
-                size = os.path.getsize(path)
-                st.write(f"    Dimensione: {size} bytes")
-        
-        map_loaded = False
-        for map_path in possible_paths:
-            if os.path.exists(map_path):
-                try:
-                    with open(map_path, "r", encoding='utf-8', errors='ignore') as f:
-                        map_html = f.read()
-                    if map_html.strip():
-                        st.success(f"✅ Mappa caricata da: {map_path}")
-                        components.html(map_html, height=500)
-                        map_loaded = True
-                        break
-                except Exception as e:
-                    st.warning(f"Errore nel caricare la mappa da {map_path}: {str(e)}")
-                    continue
+        map_loaded = render_map()
         
         if not map_loaded:
             st.info("ℹ️ La mappa sarà visualizzata qui quando analizzerai un dataset con coordinate geografiche.")
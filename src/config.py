@@ -8,17 +8,65 @@ consistency and ease of maintenance.
 # CKAN API base URL
 CKAN_BASE_URL = "https://dati.gov.it/opendata/api/3/action"
 
+# HTTP connection pool configuration (shared requests.Session)
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 20
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504) # Rate limited / transient server errors
+HTTP_TIMEOUT = (5, 30) # (connect, read) timeout in seconds
+
+# Bytes of a CSV download inspected to detect the separator (the rest is parsed as it arrives)
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Types of the road accident columns used by the analysis (read without type inference)
+INCIDENT_COLUMN_DTYPES = {
+    'Condizioni traffico': 'category',
+    'N. veicoli coinvolti': 'Int32',
+    'Latitudine': 'float32',
+    'Longitudine': 'float32'
+}
+
+# Rows parsed per chunk when reading CSV downloads (bounds the parser memory on large files)
+CSV_CHUNK_ROWS = 262_144
+
+# Maximum number of dataset downloads running at the same time
+MAX_CONCURRENT_DOWNLOADS = 10
+
+# Worker threads used to analyze several datasets (None uses one per CPU)
+MAX_ANALYSIS_WORKERS = None
+
+# Rows of a dataset rendered in the page (the full data is saved to file / downloadable)
+DATAFRAME_PREVIEW_ROWS = 200
+
+# Invalid answers accepted by the command line prompts before exiting
+INPUT_MAX_ATTEMPTS = 3
+
+# Seconds the saved package list is used without asking the server (24 hours)
+PACKAGE_LIST_MAX_AGE = 24 * 60 * 60
+
+# Maximum number of package details (package_show responses) kept in memory
+PACKAGE_DETAILS_CACHE_SIZE = 1024
+
+# Packages shown for selection whose details are fetched in the background
+PREFETCH_PACKAGE_DETAILS = 10
+
+# Number of packages requested with a single package_search call when fetching details in batch
+PACKAGE_BATCH_SIZE = 64
+
 # File paths
 DATA_DIR = "./data"
 OUTPUT_DIR = "./output"
 
 # File names
 PACKAGE_LIST_FILE = "DatiGovIt.json"
+PACKAGE_LIST_META_FILE = "DatiGovIt.meta.json" # ETag / Last-Modified of the saved package list
 FILTERED_DATA_FILE = "DatiGovItFiltrati.json"
 SELECTED_DATA_FILE = "DatiSelezionati.json"
 OUTPUT_CSV_FILE = "output.csv"
+OUTPUT_PARQUET_FILE = "output.parquet"
 OUTPUT_EXCEL_FILE = "output.xlsx"
-CONDITIONS_EXCEL_FILE = "Condizioni.xlsx"
+CONDITIONS_PARQUET_FILE = "Condizioni.parquet"
 MAP_HTML_FILE = "mappa_incidenti.html"
 
 # Pandas column display configuration - no limit
@@ -26,3 +74,5 @@ PANDAS_MAX_COLUMNS = None
 
 # Map configuration
 DEFAULT_ZOOM = 13
+MAP_HEATMAP_THRESHOLD = 10000 # Above this number of points a heatmap replaces the markers
+COORDINATE_DECIMALS = 5 # Points closer than this precision (about 1 m) share a single marker
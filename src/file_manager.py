@@ -5,16 +5,28 @@ in a project, ensuring that necessary directories exist and providing methods
 to save and load data in various formats.
 """
 
-import json # For JSON file handling
+import json # For JSON file handling (fallback when orjson is not installed)
+try:
+    import orjson # Faster JSON serialization and parsing
+except ImportError:
+    orjson = None
+try:
+    import pyarrow as pa # Columnar tables
+    import pyarrow.csv as pacsv # Multithreaded CSV writer
+except ImportError:
+    pa = pacsv = None
 import pandas as pd # For DataFrame manipulation
 import os # For file and directory operations
-from typing import Any, Dict, Optional # Type hints for documentation
+from typing import Any, Callable, Dict, Optional # Type hints for documentation
 from config import DATA_DIR, OUTPUT_DIR # Import configuration directories
 
 
 class FileManager:
     """Manages file read and write operations"""
     
+    # Directories already created by this process (shared by all instances)
+    _created_dirs = set()
+    
     def __init__(self):
         """Initialize the file manager and ensure directories exist"""
         self._ensure_directories_exist() # Create necessary directories if they don't exist
@@ -22,20 +34,47 @@ class FileManager:
     def _ensure_directories_exist(self):
         """Create necessary directories if they don't exist"""
         for directory in [DATA_DIR, OUTPUT_DIR]: # Iterate over both directories
+            self._ensure_directory(directory)
+    
+    @classmethod
+    def _ensure_directory(cls, directory: str):
+        """Create a directory once per process, skipping the makedirs syscalls on later saves"""
+        key = os.path.abspath(directory) # Relative paths depend on the working directory
+        if key not in cls._created_dirs:
             os.makedirs(directory, exist_ok=True)
+            cls._created_dirs.add(key)
+    
+    @classmethod
+    def _write_file(cls, directory: str, filename: str, write: Callable[[str], Any]) -> str:
+        """
+        Call write(filepath) in an existing directory and return the file path.
+        If the directory was deleted after being created (e.g. while the web app runs),
+        it is created again and the write is retried once.
+        """
+        # Create directory if it doesn't exist
+        cls._ensure_directory(directory)
+        
+        filepath = os.path.join(directory, filename) # Build complete file path
+        try:
+            write(filepath)
+        except FileNotFoundError:
+            cls._created_dirs.discard(os.path.abspath(directory))
+            cls._ensure_directory(directory)
+            write(filepath)
+        return filepath
     
     def save_json(self, data: Any, filename: str, directory: str = DATA_DIR) -> bool:
         """Save data in JSON format"""
+        def write(filepath: str):
+            if orjson is not None:
+                with open(filepath, 'wb') as f: # orjson produces UTF-8 bytes
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f: # Open file in write mode
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+        
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(directory, exist_ok=True)
-            
-            filepath = os.path.join(directory, filename) # Build complete file path
-            with open(filepath, 'w', encoding='utf-8') as f: # Open file in write mode
-                if isinstance(data, dict):
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                else:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
+            self._write_file(directory, filename, write)
             return True
         except Exception as e:
             print(f"Error saving JSON file {filename}: {e}")
@@ -45,6 +84,9 @@ class FileManager:
         """Load data from a JSON file"""
         try:
             filepath = os.path.join(directory, filename) # Build complete file path
+            if orjson is not None:
+                with open(filepath, 'rb') as f: # Open file in binary read mode
+                    return orjson.loads(f.read())
             with open(filepath, 'r', encoding='utf-8') as f: # Open file in read mode
                 return json.load(f)
         except Exception as e:
@@ -53,28 +95,55 @@ class FileManager:
     
     def save_dataframe_csv(self, df: pd.DataFrame, filename: str, directory: str = OUTPUT_DIR) -> bool:
         """Save a DataFrame in CSV format"""
+        def write(filepath: str):
+            if not self._write_csv_arrow(df, filepath):
+                df.to_csv(filepath, index=False) # Save DataFrame in CSV format
+        
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(directory, exist_ok=True)
-            
-            filepath = os.path.join(directory, filename) # Build complete file path
-            df.to_csv(filepath, index=False) # Save DataFrame in CSV format
+            filepath = self._write_file(directory, filename, write)
             print(f"Data saved in {filepath}")
             return True
         except Exception as e:
             print(f"Error saving CSV {filename}: {e}")
             return False
     
+    @staticmethod
+    def _write_csv_arrow(df: pd.DataFrame, filepath: str) -> bool:
+        """
+        Write a CSV file with pyarrow, returning False if pyarrow is missing or cannot convert the data.
+        The text differs from to_csv (quoted headers and strings, true/false, datetimes with microseconds),
+        the values read back are the same.
+        """
+        if pacsv is None:
+            return False
+        try:
+            # Quotes only where Arrow needs them (all text values), not around numbers
+            options = pacsv.WriteOptions(quoting_style="needed")
+            pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), filepath, write_options=options)
+            return True
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Mixed-type object columns cannot be converted: use pandas instead
+            return False
+    
     def save_dataframe_excel(self, df: pd.DataFrame, filename: str, directory: str = OUTPUT_DIR) -> bool:
         """Save a DataFrame in Excel format"""
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(directory, exist_ok=True)
-            
-            filepath = os.path.join(directory, filename) # Build complete file path
-            df.to_excel(filepath, index=False) # Save DataFrame in Excel format
+            # Save DataFrame in Excel format
+            filepath = self._write_file(directory, filename, lambda path: df.to_excel(path, index=False))
             print(f"Data saved in {filepath}")
             return True
         except Exception as e:
             print(f"Error saving Excel {filename}: {e}")
             return False
+    
+    def save_dataframe_parquet(self, df: pd.DataFrame, filename: str, directory: str = OUTPUT_DIR) -> bool:
+        """Save a DataFrame in Parquet format (columnar, for intermediate data)"""
+        try:
+            # Save DataFrame in Parquet format
+            filepath = self._write_file(directory, filename,
+                                        lambda path: df.to_parquet(path, engine='pyarrow', compression='zstd', index=False))
+            print(f"Data saved in {filepath}")
+            return True
+        except Exception as e:
+            print(f"Error saving Parquet {filename}: {e}")
+            return False
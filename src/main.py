@@ -16,33 +16,43 @@ Version: 1.0.0
 Last update: [Last update date]
 """
 import pandas as pd
+import argparse
 import os
 import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
 
 # Add the src path to PYTHONPATH 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from services import CkanApiService, DataService
 from file_manager import FileManager
-from analyzer import IncidentAnalyzer
 from ui import UserInterface
+# analyzer (folium, numpy) is imported in _analyze_incidents, the only step that needs it
 from config import (
-    PACKAGE_LIST_FILE, FILTERED_DATA_FILE, SELECTED_DATA_FILE,
-    OUTPUT_CSV_FILE, OUTPUT_EXCEL_FILE, CONDITIONS_EXCEL_FILE,
-    MAP_HTML_FILE, PANDAS_MAX_COLUMNS
+    DATA_DIR, PACKAGE_LIST_FILE, PACKAGE_LIST_META_FILE, PACKAGE_LIST_MAX_AGE,
+    FILTERED_DATA_FILE, SELECTED_DATA_FILE,
+    OUTPUT_CSV_FILE, OUTPUT_EXCEL_FILE, CONDITIONS_PARQUET_FILE,
+    MAP_HTML_FILE, PANDAS_MAX_COLUMNS, PREFETCH_PACKAGE_DETAILS, INCIDENT_COLUMN_DTYPES
 )
 
 
 class OpenDataAnalyzer:
     """Main class for Open Data analysis"""
     
-    def __init__(self):
-        """Initialize services and user interface"""
+    def __init__(self, refresh: bool = False):
+        """Initialize services and user interface (refresh ignores the saved package list)"""
+        self.refresh = refresh
         self.ckan_service = CkanApiService()
         self.data_service = DataService()
         self.file_manager = FileManager()
         self.ui = UserInterface()
         
+        # Background fetch of the details of the packages shown for selection
+        self._prefetch: Optional[Future] = None
+        self._prefetched_names = frozenset()
+        
         # Configure pandas to display more columns
         pd.set_option("display.max_columns", PANDAS_MAX_COLUMNS)
     
@@ -101,16 +111,39 @@ class OpenDataAnalyzer:
     
     def _fetch_and_save_packages(self) -> bool:
         """Retrieves and saves the package list indicating success/failure"""
-        package_data = self.ckan_service.get_package_list()
+        meta = self._load_package_list_meta()
+        
+        # Recent saved copy: no request at all
+        if meta and time.time() - meta.get('fetched_at', 0) < PACKAGE_LIST_MAX_AGE:
+            self.ui.show_info(f"Using the package list saved in {PACKAGE_LIST_FILE}")
+            return True
+        
+        # Otherwise ask the server, which answers 304 if the saved copy is still valid
+        modified, package_data, validators = self.ckan_service.get_package_list_if_modified(meta.get('validators'))
+        if not modified:
+            self.file_manager.save_json({'fetched_at': time.time(), 'validators': validators}, PACKAGE_LIST_META_FILE)
+            self.ui.show_info(f"Package list not modified, using {PACKAGE_LIST_FILE}")
+            return True
+        
         if not package_data:
             self.ui.show_error("Unable to retrieve package list")
             return False
         
         success = self.file_manager.save_json(package_data, PACKAGE_LIST_FILE)
         if success:
+            self.file_manager.save_json({'fetched_at': time.time(), 'validators': validators}, PACKAGE_LIST_META_FILE)
             self.ui.show_success(f"Package list saved in {PACKAGE_LIST_FILE}")
         return success
     
+    def _load_package_list_meta(self) -> dict:
+        """Load the metadata of the saved package list (empty if missing or if a refresh was requested)"""
+        if self.refresh:
+            return {}
+        if not all(os.path.exists(os.path.join(DATA_DIR, filename))
+                   for filename in (PACKAGE_LIST_FILE, PACKAGE_LIST_META_FILE)):
+            return {}
+        return self.file_manager.load_json(PACKAGE_LIST_META_FILE) or {}
+    
     def _filter_packages(self) -> list:
         """Filter packages by keyword"""
         # Load data
@@ -138,13 +171,28 @@ class OpenDataAnalyzer:
     
     def _select_package(self, filtered_packages: list) -> str:
         """Allows package selection"""
+        # Fetch the details of the listed packages while the user chooses, without printing into the prompt:
+        # _get_package_details waits for this fetch instead of sending the same request again
+        prefetched = filtered_packages[:PREFETCH_PACKAGE_DETAILS]
+        executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetch = executor.submit(self.ckan_service.get_package_details_many, prefetched, quiet=True)
+        self._prefetched_names = frozenset(prefetched)
+        executor.shutdown(wait=False) # The worker exits when the fetch is done
         return self.ui.get_package_selection(filtered_packages)
     
+    def _get_prefetched_details(self, package_name: str) -> Optional[dict]:
+        """Details of a package from the background fetch, waiting for it if still running (None if not fetched)"""
+        if self._prefetch is None or package_name not in self._prefetched_names:
+            return None
+        return self._prefetch.result().get(package_name)
+    
     def _get_package_details(self, package_name: str) -> dict:
         """Retrieves details of a specific package"""
         self.ui.show_info(f"Retrieving details for '{package_name}'...")
         
-        package_data = self.ckan_service.get_package_details(package_name)
+        # A failed background fetch is retried here, reporting the error
+        package_data = (self._get_prefetched_details(package_name)
+                        or self.ckan_service.get_package_details(package_name))
         if not package_data:
             self.ui.show_error(f"Unable to retrieve details for '{package_name}'")
             return {}
@@ -173,7 +221,8 @@ class OpenDataAnalyzer:
             csv_url = self.ui.get_manual_csv_url()
         
         self.ui.show_info(f"Downloading data from: {csv_url}")
-        dataframe = self.data_service.get_dataframe_from_url(csv_url)
+        # Accident columns are parsed with known types; all columns are kept for the saved output
+        dataframe = self.data_service.get_dataframe_from_url(csv_url, dtype=INCIDENT_COLUMN_DTYPES)
         
         if dataframe is not None: # User feedback on download outcome
             self.ui.show_success(f"Downloaded {len(dataframe)} records")
@@ -184,8 +233,12 @@ class OpenDataAnalyzer:
     
     def _save_basic_data(self, dataframe: pd.DataFrame):
         """Save basic data in CSV and Excel format"""
-        self.file_manager.save_dataframe_csv(dataframe, OUTPUT_CSV_FILE)
-        self.file_manager.save_dataframe_excel(dataframe, OUTPUT_EXCEL_FILE)
+        # The slow openpyxl serialization overlaps with the CSV write
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            csv_future = executor.submit(self.file_manager.save_dataframe_csv, dataframe, OUTPUT_CSV_FILE)
+            excel_future = executor.submit(self.file_manager.save_dataframe_excel, dataframe, OUTPUT_EXCEL_FILE)
+            csv_future.result()
+            excel_future.result()
     
     def _analyze_incidents(self, dataframe: pd.DataFrame):
         """
@@ -194,30 +247,31 @@ class OpenDataAnalyzer:
         If required columns are not present, informs the user and ends the analysis.
         """
         self.ui.show_info("Starting accident analysis...")
+        from analyzer import IncidentAnalyzer
         analyzer = IncidentAnalyzer(dataframe) # Create an incident analyzer instance with data downloaded from CSV
         
         # Show data summary by extracting main information and displaying it
         summary = analyzer.get_data_summary()
         self.ui.display_summary(summary)
         
-        # Check if there are columns for accident analysis
-        required_cols = ['Condizioni traffico', 'N. veicoli coinvolti']
-        if all(col in dataframe.columns for col in required_cols): # Check if all required columns are present
+        # Check if there are columns for accident analysis (set membership: one pass over the columns)
+        required_cols = frozenset({'Condizioni traffico', 'N. veicoli coinvolti'})
+        if required_cols.issubset(dataframe.columns): # Check if all required columns are present
             self.ui.show_info("Detected columns for accident analysis. Starting analysis...")
             
             # Filter for specific conditions
             filtered_incidents = analyzer.filter_traffic_conditions()
             
             if not filtered_incidents.empty:
-                # Save filtered data
-                self.file_manager.save_dataframe_excel(
+                # Save filtered data (intermediate result, Parquet is much faster than Excel)
+                self.file_manager.save_dataframe_parquet(
                     filtered_incidents, 
-                    CONDITIONS_EXCEL_FILE
+                    CONDITIONS_PARQUET_FILE
                 )
                 
                 # Create map if there are coordinates
-                if all(col in filtered_incidents.columns for col in ['Latitudine', 'Longitudine']):
-                    analyzer.create_incidents_map(filtered_incidents, MAP_HTML_FILE)
+                if frozenset({'Latitudine', 'Longitudine'}).issubset(filtered_incidents.columns):
+                    analyzer.create_incidents_map(filtered_incidents, filename=MAP_HTML_FILE)
                 else:
                     self.ui.show_info("Coordinates not available for map creation")
             else:
@@ -228,10 +282,15 @@ class OpenDataAnalyzer:
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Open data analysis from dati.gov.it")
+    parser.add_argument("--refresh", action="store_true",
+                        help="download the package list again, ignoring the saved copy")
+    args = parser.parse_args()
+    
     print("=== OPEN DATA ANALYZER ===")
     print("Open data analysis from dati.gov.it\n")
     
-    app = OpenDataAnalyzer()
+    app = OpenDataAnalyzer(refresh=args.refresh)
     app.run()
 
 
@@ -7,49 +7,201 @@ These classes handle API calls, data manipulation
 and retrieval of specific resources such as CSV files.
 """
 
+import atexit # For releasing the connection pool on shutdown
+import importlib.util # For checking optional dependencies
 import requests # For HTTP API calls
-import json     # For JSON data handling
+import json     # For JSON data handling (fallback when orjson is not installed)
+try:
+    import orjson # Parses response bytes directly, faster than json
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads # Also accepts bytes
+import re       # For compiled keyword matching
 import pandas as pd # For DataFrame manipulation
-from io import StringIO # For converting strings to readable streams
-from typing import Optional, List, Dict, Any # Type hints for documentation
-from config import CKAN_BASE_URL # Base API URL imported from configuration
+from concurrent.futures import ThreadPoolExecutor # For overlapping network downloads
+from contextlib import contextmanager # For the streamed CSV download helper
+from functools import lru_cache # For memoizing package details
+from io import BufferedReader # For peeking at the head of streamed downloads
+from requests.adapters import HTTPAdapter # For connection pooling
+from urllib3.util.retry import Retry # For automatic retries on transient errors
+from typing import Optional, List, Dict, Any, Iterator, Tuple # Type hints for documentation
+from config import ( # Base API URL and HTTP settings imported from configuration
+    CKAN_BASE_URL, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_RETRY_STATUSES, HTTP_TIMEOUT, MAX_CONCURRENT_DOWNLOADS,
+    PACKAGE_DETAILS_CACHE_SIZE, PACKAGE_BATCH_SIZE, CSV_SNIFF_BYTES, CSV_CHUNK_ROWS
+)
+
+
+def create_session() -> requests.Session:
+    """Create a requests session with connection pooling and retries"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        # Exponential backoff, also on rate limiting and transient server errors
+        max_retries=Retry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                          status_forcelist=HTTP_RETRY_STATUSES, respect_retry_after_header=True)
+    )
+    # Both schemes share the same pooled adapter
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared session: keeps TCP/TLS connections alive across CKAN and CSV downloads
+SESSION = create_session()
+atexit.register(SESSION.close) # Release the pool when the interpreter exits
+
+
+# Resource formats and URL hints identifying CSV resources (compared case-insensitively)
+_CSV_FORMATS = frozenset({"csv", "text/csv", "application/csv"})
+_CSV_URL_HINTS = (".csv", "accesstype=download")
+
+# CSV parser for whole downloads: Arrow's multithreaded reader when pyarrow is installed
+_CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+
+@lru_cache(maxsize=PACKAGE_DETAILS_CACHE_SIZE)
+def _fetch_package_show(session: requests.Session, url: str) -> Dict[str, Any]:
+    """Fetch a package_show response, memoized by URL (errors are raised and never cached)"""
+    response = session.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status() # Raise HTTPError exception if HTTP response indicates error (4xx or 5xx status codes)
+    return json_loads(response.content) # Transform JSON response into Python dictionary
 
 
 class CkanApiService:
     """Manages CKAN API calls"""
     
-    def __init__(self): 
+    def __init__(self, session: Optional[requests.Session] = None): 
         """Initialize the service with the API base URL"""
         # The API base URL is imported from configuration
         # This allows to easily change the endpoint without modifying the code
         self.base_url = CKAN_BASE_URL
+        # Reuse the shared pooled session unless a custom one is provided
+        self._session = session or SESSION
+        # A custom session is handed over to the service; the shared one belongs to the module
+        self._owns_session = self._session is not SESSION
+    
+    def close(self):
+        """
+        Release the pooled connections of a custom session.
+        The shared SESSION is also used by DataService and the other instances:
+        it is left open and released by the atexit hook.
+        """
+        if self._owns_session:
+            self._session.close()
+    
+    def __enter__(self) -> "CkanApiService":
+        """Use the service as a context manager: the connections of a custom session are released on exit"""
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @staticmethod
+    def clear_cache():
+        """Forget memoized package details so that they are fetched again"""
+        _fetch_package_show.cache_clear()
     
     def get_package_list(self) -> Optional[Dict[str, Any]]: # Return function, can be a dictionary or None
         """Retrieve the complete list of available packages"""
+        _, data, _ = self.get_package_list_if_modified()
+        return data
+    
+    def get_package_list_if_modified(self, validators: Optional[Dict[str, str]] = None
+                                     ) -> Tuple[bool, Optional[Dict[str, Any]], Dict[str, str]]:
+        """
+        Retrieve the package list with a conditional GET.
+        validators are the ETag / Last-Modified headers of a saved copy. Returns (modified, data, validators):
+        modified is False when the server answered 304 Not Modified (the saved copy is still valid, data is None)
+        """
         # Build the URL for the package list request
         url = f"{self.base_url}/package_list"
+        headers = {}
+        if validators:
+            if validators.get('ETag'):
+                headers['If-None-Match'] = validators['ETag']
+            if validators.get('Last-Modified'):
+                headers['If-Modified-Since'] = validators['Last-Modified']
         # Make GET request to API
         try:
-            response = requests.get(url)
+            response = self._session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+            if response.status_code == 304:
+                return False, None, validators
             response.raise_for_status() # Raise HTTPError exception if HTTP response indicates error (4xx or 5xx status codes)
-            return json.loads(response.text) # Transform JSON response into Python dictionary
+            new_validators = {name: response.headers[name] for name in ('ETag', 'Last-Modified')
+                              if name in response.headers}
+            return True, json_loads(response.content), new_validators # Transform JSON response into Python dictionary
         except requests.RequestException as e: # Handle request exceptions 
             print(f"Error retrieving package list: {e}")
-            return None
+            return True, None, {}
     
-    def get_package_details(self, package_id: str) -> Optional[Dict[str, Any]]: # Return function, can be a dictionary or None
-        """Retrieve details of a specific package"""
+    def get_package_details(self, package_id: str, quiet: bool = False) -> Optional[Dict[str, Any]]: # Return function, can be a dictionary or None
+        """
+        Retrieve details of a specific package (memoized: the returned dictionary is shared, do not modify it).
+        quiet does not print errors, e.g. for background prefetches.
+        """
         # Build the URL for the package details request
         # The package_id is passed as parameter to identify the package
         url = f"{self.base_url}/package_show?id={package_id}"
         try:
-            response = requests.get(url)
-            response.raise_for_status() # Raise HTTPError exception if HTTP response indicates error (4xx or 5xx status codes)
-            return json.loads(response.text) # Transform JSON response into Python dictionary
+            # Repeated requests for the same package are served from memory
+            return _fetch_package_show(self._session, url)
         except requests.RequestException as e: # Handle request exceptions
-            print(f"Error retrieving package details {package_id}: {e}")
+            if not quiet:
+                print(f"Error retrieving package details {package_id}: {e}")
             return None
     
+    def get_packages_details(self, package_ids: List[str], batch_size: int = PACKAGE_BATCH_SIZE,
+                             quiet: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retrieve details of several packages, one package_search call per batch of ids or names.
+        quiet does not print errors, e.g. for background prefetches.
+        """
+        url = f"{self.base_url}/package_search"
+        packages = []
+        for start in range(0, len(package_ids), batch_size):
+            batch = package_ids[start:start + batch_size]
+            # Filter query matching any of the packages of the batch, by id or by name
+            terms = ' OR '.join(f'"{package_id}"' for package_id in batch)
+            params = {
+                'fq': f'id:({terms}) OR name:({terms})',
+                'rows': len(batch)
+            }
+            try:
+                response = self._session.get(url, params=params, timeout=HTTP_TIMEOUT)
+                response.raise_for_status()
+                data = json_loads(response.content)
+                packages.extend(data.get('result', {}).get('results', []))
+            except requests.RequestException as e:
+                if not quiet:
+                    print(f"Error retrieving details for {len(batch)} packages: {e}")
+        return packages
+    
+    def get_package_details_many(self, package_ids: List[str], max_workers: int = MAX_CONCURRENT_DOWNLOADS,
+                                 quiet: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve details of several packages in the package_show format ({'result': package}), by package id or name.
+        One package_search call per PACKAGE_BATCH_SIZE packages instead of one package_show each;
+        the batches run concurrently. Packages whose details could not be retrieved are left out.
+        """
+        if not package_ids:
+            return {}
+        batches = [package_ids[start:start + PACKAGE_BATCH_SIZE]
+                   for start in range(0, len(package_ids), PACKAGE_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            results = executor.map(lambda batch: self.get_packages_details(batch, quiet=quiet), batches)
+            packages = [package for batch_packages in results for package in batch_packages]
+        
+        # Each package is returned under the id or name it was requested with
+        requested = set(package_ids)
+        details = {}
+        for package in packages:
+            for key in (package.get('id'), package.get('name')):
+                if key in requested:
+                    details[key] = {'success': True, 'result': package}
+        return details
+    
     def search_packages(self, keyword: str, rows: int = 100) -> List[Dict[str, Any]]:
         """Search packages using a keyword"""
         url = f"{self.base_url}/package_search"
@@ -58,9 +210,9 @@ class CkanApiService:
             'rows': rows
         }
         try:
-            response = requests.get(url, params=params)
+            response = self._session.get(url, params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
-            data = json.loads(response.text)
+            data = json_loads(response.content)
             return data.get('result', {}).get('results', [])
         except requests.RequestException as e:
             print(f"Error searching packages with keyword '{keyword}': {e}")
@@ -94,56 +246,143 @@ class DataService:
         return max_sep if max_count > 0 else ','
     
     @staticmethod
-    def get_dataframe_from_url(url: str) -> Optional[pd.DataFrame]: # Return function as a df object
-        """Retrieve a DataFrame from a CSV URL"""
-        try:
-            response = requests.get(url)
+    def iter_dataframe_from_url(url: str, chunksize: int = CSV_CHUNK_ROWS,
+                                usecols: Optional[List[str]] = None,
+                                dtype: Optional[Dict[str, Any]] = None,
+                                dtype_backend: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yield the rows of a CSV URL as DataFrame chunks, parsed while the body is downloaded.
+        usecols, dtype and dtype_backend are passed to pd.read_csv (only the listed columns, with known types;
+        'pyarrow' gives Arrow-backed columns, as the pyarrow engine does).
+        """
+        backend = {'dtype_backend': dtype_backend} if dtype_backend else {}
+        with DataService._open_csv_stream(url) as (stream, separator):
+            # Read CSV with detected separator, chunksize rows at a time
+            with pd.read_csv(stream, sep=separator, encoding='utf-8', engine='c', low_memory=False,
+                             usecols=usecols, dtype=dtype, chunksize=chunksize, **backend) as reader:
+                yield from reader
+    
+    @staticmethod
+    @contextmanager
+    def _open_csv_stream(url: str) -> Iterator[Tuple[BufferedReader, str]]:
+        """Open a streamed CSV download, giving the buffered body and its detected separator"""
+        # Streamed download: the parser consumes the body as it arrives
+        with SESSION.get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
             response.raise_for_status() # Raise HTTPError exception if HTTP response indicates error (4xx or 5xx status codes)
-            data = response.content.decode('utf-8')
+            response.raw.decode_content = True # Undo gzip/deflate transfer encoding
+            stream = BufferedReader(response.raw, buffer_size=CSV_SNIFF_BYTES)
+            
+            # Detect the separator used in the CSV from the head, without consuming it
+            head = stream.peek(CSV_SNIFF_BYTES)[:CSV_SNIFF_BYTES].decode('utf-8', errors='ignore')
+            yield stream, DataService.detect_csv_separator(head)
+    
+    @staticmethod
+    def _read_csv_chunks(url: str, usecols: Optional[List[str]] = None,
+                         dtype: Optional[Dict[str, Any]] = None, use_arrow: bool = True) -> List[pd.DataFrame]:
+        """
+        Read a whole CSV URL: in one pass with pyarrow if available (and use_arrow), else in chunks with the C parser.
+        With usecols / dtype, an Arrow error is raised to the caller instead of downloading the file again
+        with the same schema: it is most likely a column/type mismatch that the C parser would hit as well.
+        When pyarrow is installed the C parser also returns Arrow-backed columns, so callers get the same
+        types whichever parser read the file.
+        """
+        dtype_backend = 'pyarrow' if _CSV_ENGINE == "pyarrow" else None
+        if use_arrow and _CSV_ENGINE == "pyarrow":
+            try:
+                with DataService._open_csv_stream(url) as (stream, separator):
+                    return [pd.read_csv(stream, sep=separator, encoding='utf-8', engine='pyarrow',
+                                        dtype_backend='pyarrow', usecols=usecols, dtype=dtype)]
+            except ImportError as e:
+                print(f"pyarrow is not usable, using the C parser: {e}")
+                dtype_backend = None
+            except (ValueError, KeyError) as e:
+                # pyarrow reports missing usecols columns as ArrowKeyError (a KeyError)
+                if usecols is not None or dtype is not None:
+                    raise ValueError(str(e)) from e
+                # Data not supported by the Arrow reader
+                print(f"pyarrow could not parse the CSV from {url}, using the C parser: {e}")
+        return list(DataService.iter_dataframe_from_url(url, usecols=usecols, dtype=dtype,
+                                                        dtype_backend=dtype_backend))
+    
+    @staticmethod
+    def get_dataframe_from_url(url: str, usecols: Optional[List[str]] = None,
+                               dtype: Optional[Dict[str, Any]] = None) -> Optional[pd.DataFrame]: # Return function as a df object
+        """
+        Retrieve a DataFrame from a CSV URL.
+        With usecols / dtype, columns are read with the given schema; if the file does not match it
+        (missing columns, values of another type) it is read again with full type inference.
+        """
+        try:
+            try:
+                chunks = DataService._read_csv_chunks(url, usecols=usecols, dtype=dtype)
+            except ValueError as e:
+                if (usecols is None and dtype is None) or isinstance(e, pd.errors.ParserError):
+                    raise
+                print(f"CSV from {url} does not match the expected columns/types, reading all columns: {e}")
+                usecols = dtype = None
+                # Single retry, with the C parser: it also reads files the Arrow reader rejects
+                chunks = DataService._read_csv_chunks(url, use_arrow=False)
             
-            # Detect the separator used in the CSV
-            separator = DataService.detect_csv_separator(data)
+            # The chunks are joined once, at the end of the download
+            if not chunks:
+                return pd.DataFrame()
+            df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
             
-            # Read CSV with detected separator
-            df = pd.read_csv(StringIO(data), sep=separator)
+            # Chunks with different categories are joined as object: restore the categorical columns
+            for column, column_type in (dtype or {}).items():
+                if column_type == 'category' and column in df.columns and df[column].dtype != 'category':
+                    df[column] = df[column].astype('category')
             return df
         except requests.RequestException as e:
             print(f"Error retrieving data from {url}: {e}")
             return None
+        except pd.errors.ParserError as e:
+            print(f"Error parsing CSV from {url}: {e}")
+            return None
         except Exception as e:
             print(f"Error converting to DataFrame: {e}")
             return None
     
     @staticmethod
     def filter_packages_by_keyword(packages: List[str], keyword: str) -> List[str]:
-        """Filter packages based on a keyword"""
-        return [package for package in packages if keyword.lower() in package.lower()]
+        """Filter packages matching any of the whitespace separated keywords (case-insensitive)"""
+        packages = list(packages)
+        if not packages:
+            return []
+        
+        # A single alternation matches every keyword in one pass over the names
+        keywords = keyword.split() or [keyword]
+        pattern = '|'.join(map(re.escape, keywords))
+        
+        # Arrow strings run the match as one vectorized kernel; plain objects otherwise
+        try:
+            names = pd.Series(packages, dtype="string[pyarrow]")
+        except ImportError:
+            names = pd.Series(packages, dtype=object)
+        mask = names.str.contains(pattern, case=False, regex=True, na=False)
+        return names[mask.to_numpy(dtype=bool)].tolist()
     
     @staticmethod
     def find_csv_resource_url(package_data: Dict[str, Any]) -> Optional[str]:
         """Find CSV resource URL in a package"""
         resources = package_data.get('result', {}).get('resources', []) # Get the resource list from package
-        # Iterate over resources to find the one with CSV format
-        for resource in resources:
-            format_type = resource.get('format', '')
-            url = resource.get('url', '')
-            # Check for CSV format and URL containing .csv or accessType=DOWNLOAD for CSV
-            if format_type == 'CSV' and ('.csv' in url or 'accessType=DOWNLOAD' in url):
-                return resource.get('url')
-        return None
+        # First resource with CSV format and URL containing .csv or accessType=DOWNLOAD
+        return next((resource['url'] for resource in resources
+                     if DataService._is_csv_resource(resource)
+                     and any(hint in resource['url'].casefold() for hint in _CSV_URL_HINTS)), None)
+    
+    @staticmethod
+    def _is_csv_resource(resource: Dict[str, Any]) -> bool:
+        """Check whether a resource has a CSV format (csv, CSV, text/csv, ...) and a URL"""
+        return bool(resource.get('url')) and (resource.get('format') or '').strip().casefold() in _CSV_FORMATS
     
     @staticmethod
     def retrieve_dataset(package: Dict[str, Any]) -> Optional[pd.DataFrame]:
         """Retrieve dataset from a package"""
         # Find CSV resource URL from package resources
         resources = package.get('resources', [])
-        for resource in resources:
-            format_type = resource.get('format', '')
-            url = resource.get('url', '')
-            # Check for CSV format
-            if format_type == 'CSV' and url:
-                return DataService.get_dataframe_from_url(url)
-        return None
+        url = next((resource['url'] for resource in resources if DataService._is_csv_resource(resource)), None)
+        return DataService.get_dataframe_from_url(url) if url else None
     
     @staticmethod
     def process_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
@@ -5,20 +5,41 @@ This class provides methods for:
 - Confirming actions
 - Showing summaries, errors and success messages
 """
-from typing import List 
+from typing import Callable, List, Optional, TypeVar
+from config import INPUT_MAX_ATTEMPTS # Invalid answers accepted before giving up
+
+T = TypeVar('T')
 
 
 class UserInterface:
     """Manages user interaction"""
     
+    @staticmethod
+    def _ask(prompt: str, parse: Callable[[str], Optional[T]], error_message: str) -> T:
+        """
+        Ask until parse accepts the answer (returns something other than None).
+        Gives up after INPUT_MAX_ATTEMPTS invalid answers, and when stdin is closed,
+        so that scripted runs cannot wait forever
+        """
+        for _ in range(INPUT_MAX_ATTEMPTS):
+            try:
+                answer = input(prompt).strip()
+            except EOFError:
+                print("\nNo input available, exiting.")
+                raise SystemExit(2)
+            value = parse(answer)
+            if value is not None:
+                return value
+            print(error_message)
+        print("Too many invalid answers, exiting.")
+        raise SystemExit(2)
+    
     @staticmethod
     def get_keyword_input() -> str:
         """Ask user to enter a keyword to filter data"""
-        while True:
-            keyword = input("Enter a keyword to filter data: ").strip()
-            if keyword:
-                return keyword
-            print("Please enter a valid keyword.")
+        return UserInterface._ask("Enter a keyword to filter data: ",
+                                  lambda keyword: keyword or None,
+                                  "Please enter a valid keyword.")
     
     @staticmethod
     def get_package_selection(filtered_packages: List[str]) -> str:
@@ -26,38 +47,34 @@ class UserInterface:
         if not filtered_packages:
             return ""
         
+        # Set built once: O(1) membership test on every input attempt
+        valid_packages = set(filtered_packages)
+        
         print("\nAvailable packages:")
-        for i, package in enumerate(filtered_packages[:10], 1):  # Show only first 10
-            print(f"{i}. {package}")
+        print("\n".join(f"{i}. {package}" for i, package in enumerate(filtered_packages[:10], 1)))  # Show only first 10
         
         if len(filtered_packages) > 10:
             print(f"... and {len(filtered_packages) - 10} other packages")
         
-        while True:
-            selection = input("\nEnter the name of the data you want to select: ").strip()
-            if selection in filtered_packages:
-                return selection
-            print("Please select a valid package from the list.")
+        return UserInterface._ask("\nEnter the name of the data you want to select: ",
+                                  lambda selection: selection if selection in valid_packages else None,
+                                  "Please select a valid package from the list.")
     
     @staticmethod
     def get_manual_csv_url() -> str:
         """Ask user to manually enter a CSV URL"""
-        while True:
-            url = input("Enter CSV file URL manually: ").strip()
-            if url and url.startswith('http'):
-                return url
-            print("Please enter a valid URL starting with http.")
+        return UserInterface._ask("Enter CSV file URL manually: ",
+                                  lambda url: url if url.startswith('http') else None,
+                                  "Please enter a valid URL starting with http.")
     
     @staticmethod
     def confirm_action(message: str) -> bool: # The `message` parameter is a string containing the message to show to the user
         """Ask user for action confirmation"""
-        while True:
-            response = input(f"{message} (y/n): ").strip().lower()
-            if response in ['y', 'yes', 's', 'si']:
-                return True
-            elif response in ['n', 'no']:
-                return False
-            print("Please answer with 'y' for yes or 'n' for no.")
+        # Only the first letter counts: y/yes/s/si confirm, n/no refuses
+        answers = {'y': True, 's': True, 'n': False}
+        return UserInterface._ask(f"{message} (y/n): ",
+                                  lambda response: answers.get(response[:1].lower()),
+                                  "Please answer with 'y' for yes or 'n' for no.")
     
     @staticmethod
     def display_summary(summary: dict): # The `summary` parameter is a dictionary containing data to display
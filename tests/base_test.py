@@ -6,7 +6,8 @@ Raggruppa il codice che sarebbe ridondante in altri file di test.
 """
 import sys
 from abc import ABC, abstractmethod # Classi astratte per definire metodi comuni
-from typing import List, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor # Esecuzione parallela dei test indipendenti
+from typing import List, Tuple, Callable, Optional
 
 
 class BaseTest(ABC):
@@ -25,12 +26,15 @@ class BaseTest(ABC):
         self.test_name = test_name
         self.results: List[Tuple[str, bool]] = []
     
-    def run_tests(self, tests: List[Tuple[str, Callable]]) -> bool:
+    def run_tests(self, tests: List[Tuple[str, Callable]], max_workers: int = 1) -> bool:
         """
         Esegue una lista di test e raccoglie i risultati.
         
         Args:
             tests: Lista di tuple (nome_test, funzione_test)
+            max_workers: Numero di test eseguiti in parallelo (1 = in sequenza).
+                         Si usano thread: i test sono metodi e lambda, non serializzabili
+                         per un pool di processi. Adatto solo a test indipendenti.
             
         Returns:
             True se tutti i test passano, False altrimenti
@@ -39,23 +43,42 @@ class BaseTest(ABC):
         
         self.results = []
         
-        for test_name, test_func in tests:
-            try:
+        if max_workers > 1 and len(tests) > 1:
+            # Esecuzione parallela: gli esiti sono stampati alla fine, nell'ordine dei test
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(tests))) as executor:
+                futures = [executor.submit(self._execute_test, test_func) for _, test_func in tests]
+                try:
+                    for (test_name, _), future in zip(tests, futures):
+                        self._record_result(test_name, *future.result())
+                except BaseException:
+                    # Timeout o interruzione: i test non ancora avviati vengono annullati
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        else:
+            for test_name, test_func in tests:
                 print(f"🔍 Eseguendo {test_name}...")
-                result = test_func()
-                self.results.append((test_name, result))
-                
-                if result:
-                    print(f"✅ {test_name} completato con successo\n")
-                else:
-                    print(f"❌ {test_name} fallito\n")
-                    
-            except Exception as e:
-                print(f"❌ Errore in {test_name}: {e}\n")
-                self.results.append((test_name, False))
+                self._record_result(test_name, *self._execute_test(test_func))
         
         return self.report_results()
     
+    @staticmethod
+    def _execute_test(test_func: Callable) -> Tuple[bool, Optional[Exception]]:
+        """Esegue un singolo test, restituendo (esito, eventuale eccezione)"""
+        try:
+            return bool(test_func()), None
+        except Exception as e:
+            return False, e
+    
+    def _record_result(self, test_name: str, result: bool, error: Optional[Exception]) -> None:
+        """Registra e stampa l'esito di un test"""
+        self.results.append((test_name, result))
+        if error is not None:
+            print(f"❌ Errore in {test_name}: {error}\n")
+        elif result:
+            print(f"✅ {test_name} completato con successo\n")
+        else:
+            print(f"❌ {test_name} fallito\n")
+    
     def report_results(self) -> bool:
         """
         Genera un report finale dei risultati dei test.
@@ -70,29 +93,37 @@ class BaseTest(ABC):
         # Calcola statistiche
         passed = sum(1 for _, result in self.results if result)
         total = len(self.results)
+        all_passed = passed == total
         
-        # Stampa separatore e header
-        print("\n" + "="*60)
-        print(f"RISULTATI TEST {self.test_name.upper()}:")
-        print("="*60)
+        # Il report è composto riga per riga e scritto con una sola operazione
+        # Separatore e header
+        lines = [
+            "\n" + "="*60,
+            f"RISULTATI TEST {self.test_name.upper()}:",
+            "="*60
+        ]
         
-        # Stampa risultati individuali
+        # Risultati individuali
         for test_name, result in self.results:
             status = "✅ PASS" if result else "❌ FAIL"
-            print(f"{status} {test_name}")
+            lines.append(f"{status} {test_name}")
         
-        # Stampa riassunto
-        print(f"\nTotale: {passed}/{total} test passati")
+        # Riassunto
+        lines.append(f"\nTotale: {passed}/{total} test passati")
         percentage = (passed / total) * 100
-        print(f"Percentuale successo: {percentage:.1f}%")
+        lines.append(f"Percentuale successo: {percentage:.1f}%")
         
         # Messaggio finale
-        if passed == total:
-            print(f"\n🎉 TUTTI I TEST {self.test_name.upper()} SONO PASSATI!")
+        if all_passed:
+            lines.append(f"\n🎉 TUTTI I TEST {self.test_name.upper()} SONO PASSATI!")
+        else:
+            lines.append(f"\n⚠️  ALCUNI TEST {self.test_name.upper()} SONO FALLITI")
+        sys.stdout.write("\n".join(lines) + "\n")
+        
+        if all_passed:
             self._success_message()
             return True
         else:
-            print(f"\n⚠️  ALCUNI TEST {self.test_name.upper()} SONO FALLITI")
             self._failure_message()
             return False
     
@@ -5,26 +5,64 @@ Esegue i test unificati in un unico file per evitare duplicazioni.
 Elimina la necessità di eseguire test separati per ogni modulo.
 """
 
+import os
+import signal
 import sys
-import subprocess
+import threading
+import _thread
+
+# I moduli di test vengono importati nello stesso processo
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SUITE_TIMEOUT = 120  # Secondi massimi per l'intera suite
+
+
+class SuiteTimeout(BaseException):
+    """
+    Sollevata quando la suite supera SUITE_TIMEOUT.
+    Deriva da BaseException, come KeyboardInterrupt, così gli except Exception
+    dei singoli test e di BaseTest non la scambiano per un test fallito.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise SuiteTimeout()
+
+
+def _run_with_timeout(function, seconds: int):
+    """Esegue function interrompendola dopo seconds secondi (SIGALRM su POSIX, Timer altrove)"""
+    if hasattr(signal, 'SIGALRM'):
+        previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(seconds)
+        try:
+            return function()
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    # Windows: il timer interrompe il thread principale con KeyboardInterrupt
+    timer = threading.Timer(seconds, _thread.interrupt_main)
+    timer.start()
+    try:
+        return function()
+    except KeyboardInterrupt:
+        if timer.finished.is_set():
+            raise SuiteTimeout()
+        raise
+    finally:
+        timer.cancel()
 
 def run_unified_tests():
-    """Esegue la suite unificata di test"""
+    """Esegue la suite unificata di test nello stesso processo"""
     print("🚀 AVVIO SUITE UNIFICATA DI TEST")
     print("="*60)
     
     try:
-        result = subprocess.run([
-            sys.executable, 'test_unified.py'
-        ], capture_output=True, text=True, timeout=120)
-        
-        print(result.stdout)
-        if result.stderr:
-            print("STDERR:", result.stderr)
-            
-        return result.returncode == 0
+        from test_unified import UnifiedTestSuite
+        # run_all_tests restituisce l'esito, test_unified.main invece chiamerebbe sys.exit
+        return _run_with_timeout(lambda: UnifiedTestSuite().run_all_tests(), SUITE_TIMEOUT)
         
-    except subprocess.TimeoutExpired:
+    except SuiteTimeout:
         print("❌ TIMEOUT: Suite di test troppo lenta")
         return False
     except Exception as e:
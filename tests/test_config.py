@@ -6,12 +6,15 @@ Contains constants, paths and shared configurations.
 
 import os
 import tempfile
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple
 
 # ===== GENERAL CONFIGURATIONS =====
 TEST_TIMEOUT = 30
 TEST_MAX_RETRIES = 3
 VERBOSE_OUTPUT = True
+# Test indipendenti eseguiti in parallelo nelle fasi che lo consentono (ANALISI_TEST_WORKERS per forzarne il numero)
+TEST_MAX_WORKERS = int(os.environ.get("ANALISI_TEST_WORKERS", os.cpu_count() or 1))
 
 # ===== PATHS =====
 # Project base path (main folder)
@@ -34,6 +37,16 @@ MODULES_TO_TEST = [
     ("migrate.py", os.path.join(SRC_DIR, "migrate.py"))
 ]
 
+# Modules imported by the import tests with the attributes each must expose
+IMPORT_SPECS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("config", ("CKAN_BASE_URL", "DATA_DIR")),
+    ("services", ("CkanApiService", "DataService")),
+    ("file_manager", ("FileManager",)),
+    ("analyzer", ("IncidentAnalyzer",)),
+    ("ui", ("UserInterface",)),
+    ("main", ("OpenDataAnalyzer",)),
+)
+
 # ===== TEST DATA =====
 # Sample data for JSON tests
 SAMPLE_JSON_DATA: Dict[str, Any] = {
@@ -62,6 +75,9 @@ SAMPLE_INCIDENT_DATA: Dict[str, List[Any]] = {
 }
 
 # ===== CONFIGURAZIONI TEMPORANEE =====
+# Filesystem in memoria preferito per le directory temporanee dei test (se non esiste si usa quello di sistema)
+TEST_TMPFS_DIR = os.environ.get("ANALISI_TMPFS", "/dev/shm")
+
 def get_temp_directory() -> str:
     """
     Crea e restituisce un percorso per directory temporanea sicura.
@@ -103,11 +119,14 @@ PARTY_EMOJI = "🎉"
 # Pattern per separatori
 SEPARATOR_LONG = "=" * 60
 SEPARATOR_SHORT = "-" * 40
+SEPARATOR_REPORT = "=" * 80
 
 # ===== VALIDAZIONI =====
+@lru_cache(maxsize=1)
 def validate_project_structure() -> bool:
     """
     Valida che la struttura del progetto sia corretta.
+    Il risultato è memorizzato: vedi clear_module_cache().
     
     Returns:
         True se la struttura è valida, False altrimenti
@@ -121,12 +140,14 @@ def validate_project_structure() -> bool:
     
     return True
 
-def get_available_modules() -> List[tuple]:
+@lru_cache(maxsize=1)
+def get_available_modules() -> Tuple[Tuple[str, str], ...]:
     """
     Restituisce solo i moduli che esistono effettivamente.
+    Il risultato è memorizzato (tupla immutabile, condivisa tra le chiamate): vedi clear_module_cache().
 
     Returns:
-        Lista di tuple (nome_modulo, percorso) per moduli esistenti
+        Tupla di coppie (nome_modulo, percorso) per moduli esistenti
     """
     available = []
     for module_name, module_path in MODULES_TO_TEST:
@@ -135,4 +156,12 @@ def get_available_modules() -> List[tuple]:
         else:
             print(f"{WARNING_EMOJI} Modulo non trovato: {module_path}")
     
-    return available
+    return tuple(available)
+
+def clear_module_cache() -> None:
+    """
+    Svuota i risultati memorizzati di get_available_modules e validate_project_structure,
+    da chiamare nei test che modificano MODULES_TO_TEST o la struttura delle cartelle.
+    """
+    get_available_modules.cache_clear()
+    validate_project_structure.cache_clear()
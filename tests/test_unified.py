@@ -11,11 +11,35 @@ Questo script unifica tutti i test in un'unica suite completa:
 Elimina le duplicazioni e fornisce un'interfaccia di test semplificata.
 """
 
+import importlib
+import os
 import sys
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Tuple
 from base_test import BaseTest
-from test_config import get_available_modules, SAMPLE_JSON_DATA
-from test_utils import setup_python_path, temporary_directory, create_sample_dataframe
+from test_config import (
+    get_available_modules, SAMPLE_JSON_DATA, TEST_MAX_WORKERS, IMPORT_SPECS,
+    SEPARATOR_LONG, SEPARATOR_REPORT
+)
+from test_utils import (
+    setup_python_path, temporary_directory, create_sample_dataframe, has_all_attributes, verify_module_attributes,
+    validate_excel_operations, FakeResponse, FakeSession, patched_attribute,
+    working_directory, capture_function_output, temporary_fd
+)
+
+
+@lru_cache(maxsize=256)
+def _compiled(file_path: str, mtime_ns: int, size: int) -> bool:
+    """
+    Compila un file sorgente; mtime e dimensione fanno parte della chiave,
+    così un file modificato viene riletto e ricompilato.
+    I byte sono passati direttamente a compile, che gestisce BOM e dichiarazione di codifica.
+    Si memorizza solo l'esito: il code object viene scartato subito.
+    """
+    with open(file_path, 'rb') as f:
+        # dont_inherit: i __future__ di questo file non influenzano la verifica
+        compile(f.read(), file_path, 'exec', dont_inherit=True)
+    return True
 
 
 class UnifiedTestSuite(BaseTest):
@@ -24,112 +48,96 @@ class UnifiedTestSuite(BaseTest):
     def __init__(self):
         super().__init__("🎯 Suite Unificata AnalisiOpenData")
         self.modules = get_available_modules()
+    
+    def _success_message(self) -> None:
+        print("Fase completata senza errori.")
+    
+    def _failure_message(self) -> None:
+        print("Correggi i test falliti di questa fase prima di procedere.")
         
+    @staticmethod
+    def _print_phase_header(title: str) -> None:
+        """Stampa l'intestazione di una fase con una sola scrittura"""
+        sys.stdout.write(f"\n{SEPARATOR_LONG}\n{title}\n{SEPARATOR_LONG}\n")
+    
     def run_syntax_tests(self) -> bool:
         """Esegue test di sintassi su tutti i moduli"""
-        print("\n" + "="*60)
-        print("🔍 FASE 1: TEST SINTASSI")
-        print("="*60)
+        self._print_phase_header("🔍 FASE 1: TEST SINTASSI")
         
         syntax_tests = []
-        for module_name, file_path in self.modules.items():
+        for module_name, file_path in self.modules:
             syntax_tests.append((f"Sintassi {module_name}", 
                                lambda fp=file_path, mn=module_name: self._test_syntax(mn, fp)))
         
-        return self.run_tests(syntax_tests)
+        # Compilazioni indipendenti: eseguite in parallelo
+        return self.run_tests(syntax_tests, max_workers=TEST_MAX_WORKERS)
     
     def _test_syntax(self, module_name: str, file_path: str) -> bool:
-        """Test sintassi singolo modulo"""
+        """Test sintassi singolo modulo (altri errori, es. file illeggibile, sono riportati da run_tests)"""
+        st = os.stat(file_path)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                code = f.read()
-            compile(code, file_path, 'exec')
-            return True
-        except (SyntaxError, Exception) as e:
+            return _compiled(file_path, st.st_mtime_ns, st.st_size)
+        except SyntaxError as e:
             print(f"❌ {module_name}: {e}")
             return False
     
     def run_import_tests(self) -> bool:
         """Esegue test di importazione"""
-        print("\n" + "="*60)
-        print("📦 FASE 2: TEST IMPORTAZIONI")
-        print("="*60)
+        self._print_phase_header("📦 FASE 2: TEST IMPORTAZIONI")
         
-        import_tests = [
-            ("Import config", self._test_import_config),
-            ("Import services", self._test_import_services),
-            ("Import file_manager", self._test_import_file_manager),
-            ("Import analyzer", self._test_import_analyzer),
-            ("Import ui", self._test_import_ui),
-            ("Import main", self._test_import_main),
-        ]
+        import_tests = [(f"Import {module_name}",
+                         lambda mn=module_name, attrs=required_attrs: self._test_import(mn, attrs))
+                        for module_name, required_attrs in IMPORT_SPECS]
         
         return self.run_tests(import_tests)
     
-    def _test_import_config(self) -> bool:
-        """Test import config"""
-        try:
-            import config
-            # Verifica costanti essenziali
-            return hasattr(config, 'CKAN_API_URL') and hasattr(config, 'DATA_DIR')
-        except Exception:
-            return False
-    
-    def _test_import_services(self) -> bool:
-        """Test import services"""
-        try:
-            import services
-            return hasattr(services, 'CkanApiService') and hasattr(services, 'DataService')
-        except Exception:
-            return False
-    
-    def _test_import_file_manager(self) -> bool:
-        """Test import file_manager"""
-        try:
-            import file_manager
-            return hasattr(file_manager, 'FileManager')
-        except Exception:
-            return False
-    
-    def _test_import_analyzer(self) -> bool:
-        """Test import analyzer"""
-        try:
-            import analyzer
-            return hasattr(analyzer, 'IncidentAnalyzer')
-        except Exception:
-            return False
-    
-    def _test_import_ui(self) -> bool:
-        """Test import ui"""
-        try:
-            import ui
-            return hasattr(ui, 'UserInterface')
-        except Exception:
-            return False
-    
-    def _test_import_main(self) -> bool:
-        """Test import main"""
+    def _test_import(self, module_name: str, required_attrs: Tuple[str, ...]) -> bool:
+        """Test import di un modulo e presenza degli attributi richiesti"""
         try:
-            import main
-            return hasattr(main, 'OpenDataAnalyzer')
-        except Exception:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            print(f"❌ {module_name}: {e}")
             return False
+        
+        if has_all_attributes(module, required_attrs):
+            return True
+        
+        # Solo in caso di errore si elencano tutti gli attributi mancanti
+        _, missing = verify_module_attributes(module, list(required_attrs))
+        print(f"❌ {module_name}: attributi mancanti {missing}")
+        return False
     
     def run_functional_tests(self) -> bool:
         """Esegue test funzionali"""
-        print("\n" + "="*60)
-        print("⚙️ FASE 3: TEST FUNZIONALITÀ")
-        print("="*60)
+        self._print_phase_header("⚙️ FASE 3: TEST FUNZIONALITÀ")
         
         functional_tests = [
             ("FileManager JSON", self._test_file_manager_json),
             ("FileManager CSV", self._test_file_manager_csv),
+            ("FileManager Excel", self._test_file_manager_excel),
+            ("FileManager CSV round-trip", self._test_file_manager_csv_roundtrip),
+            ("FileManager directory rimossa", self._test_file_manager_removed_directory),
             ("DataService Filter", self._test_data_service_filter),
+            ("DataService Filter parole multiple", self._test_data_service_filter_keywords),
+            ("DataService risorsa CSV", self._test_find_csv_resource),
             ("IncidentAnalyzer", self._test_incident_analyzer),
+            ("IncidentAnalyzer filtro traffico", self._test_traffic_filter),
+        ]
+        
+        # Test che sostituiscono attributi di modulo (es. services.SESSION): eseguiti in sequenza
+        patched_tests = [
             ("CkanApiService", self._test_ckan_api_service),
+            ("DataService schema non corrispondente", self._test_dataset_schema_fallback),
+            ("Lista pacchetti: cache e richieste condizionali", self._test_package_list_cache),
+            ("Dettagli pacchetti: prefetch", self._test_package_details_prefetch),
+            ("UserInterface input ripetuto", self._test_ui_input_attempts),
+            ("Mappa incidenti: punti duplicati e heatmap", self._test_incidents_map),
         ]
         
-        return self.run_tests(functional_tests)
+        # Ogni test usa le proprie istanze e cartelle temporanee: eseguiti in parallelo
+        parallel_passed = self.run_tests(functional_tests, max_workers=TEST_MAX_WORKERS)
+        patched_passed = self.run_tests(patched_tests)
+        return parallel_passed and patched_passed
     
     def _test_file_manager_json(self) -> bool:
         """Test FileManager operazioni JSON"""
@@ -161,6 +169,69 @@ class UnifiedTestSuite(BaseTest):
         except Exception:
             return False
     
+    def _test_file_manager_csv_roundtrip(self) -> bool:
+        """Test CSV salvato da FileManager: riletto con pandas dà gli stessi valori di to_csv"""
+        try:
+            import numpy as np
+            import pandas as pd
+            from file_manager import FileManager
+            
+            # Tipi che il writer Arrow formatta in modo diverso da to_csv
+            df = pd.DataFrame({
+                'intero': [1, 2, 3],
+                'decimale': [1.5, np.nan, 0.1],
+                'testo': ['a', 'b,c', 'd"e'],
+                'nullable': pd.array([1, None, 3], dtype='Int32'),
+                'categoria': pd.Categorical(['Intenso', 'Normale', None]),
+                'booleano': [True, False, True],
+                'data': pd.to_datetime(['2024-01-01', '2024-01-02 10:30', None], format='ISO8601'),
+                'latitudine': np.array([45.464, 45.465, 45.466], dtype='float32'),
+            })
+            with temporary_directory() as temp_dir, temporary_fd(".csv") as (fd, expected_path):
+                if not FileManager().save_dataframe_csv(df, "roundtrip.csv", temp_dir):
+                    return False
+                saved = pd.read_csv(os.path.join(temp_dir, "roundtrip.csv"), parse_dates=['data'])
+                # Riferimento scritto sul descrittore già aperto, chiuso da temporary_fd
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='', closefd=False) as expected_file:
+                    df.to_csv(expected_file, index=False)
+                expected = pd.read_csv(expected_path, parse_dates=['data'])
+            pd.testing.assert_frame_equal(saved, expected)
+            return True
+        except AssertionError as e:
+            print(f"❌ CSV diverso da to_csv: {e}")
+            return False
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_file_manager_removed_directory(self) -> bool:
+        """Test salvataggio dopo la rimozione della directory già creata in questo processo"""
+        try:
+            import shutil
+            from file_manager import FileManager
+            fm = FileManager()
+            
+            with temporary_directory() as temp_dir:
+                output_dir = os.path.join(temp_dir, "output")
+                if not fm.save_json(SAMPLE_JSON_DATA, "prima.json", output_dir):
+                    return False
+                shutil.rmtree(output_dir)
+                # La directory è ricreata invece di fallire fino al riavvio
+                return (fm.save_json(SAMPLE_JSON_DATA, "dopo.json", output_dir)
+                        and fm.save_dataframe_csv(create_sample_dataframe(), "dopo.csv", output_dir))
+        except Exception:
+            return False
+    
+    def _test_file_manager_excel(self) -> bool:
+        """Test FileManager salvataggio Excel"""
+        try:
+            from file_manager import FileManager
+            
+            with temporary_directory() as temp_dir:
+                return validate_excel_operations(FileManager(), temp_dir)
+        except Exception:
+            return False
+    
     def _test_data_service_filter(self) -> bool:
         """Test DataService filtro pacchetti"""
         try:
@@ -173,6 +244,63 @@ class UnifiedTestSuite(BaseTest):
         except Exception:
             return False
     
+    def _test_data_service_filter_keywords(self) -> bool:
+        """Test filtro pacchetti: più parole in OR, maiuscole/minuscole e caratteri speciali delle regex"""
+        try:
+            from services import DataService
+            
+            packages = ["Incidenti-Stradali-2023", "traffico-urbano", "meteo-data", "dati.x.y", "datixy",
+                        "c++-sorgenti", "qualità-aria"]
+            cases = {
+                "incidenti traffico": ["Incidenti-Stradali-2023", "traffico-urbano"], # OR, ordine originale
+                "INCIDENTI": ["Incidenti-Stradali-2023"],
+                "dati.x": ["dati.x.y"], # Il punto non fa da carattere jolly
+                "c++": ["c++-sorgenti"], # Nessun errore di regex
+                "QUALITÀ": ["qualità-aria"],
+                "inesistente": [],
+            }
+            for keyword, expected in cases.items():
+                found = DataService.filter_packages_by_keyword(iter(packages), keyword)
+                if found != expected:
+                    print(f"❌ '{keyword}': {found} invece di {expected}")
+                    return False
+            return DataService.filter_packages_by_keyword([], "incidenti") == []
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_find_csv_resource(self) -> bool:
+        """Test scelta della risorsa CSV: formato, indizi nell'URL e ordine delle risorse"""
+        try:
+            from services import DataService
+            
+            def package(*resources):
+                return {'result': {'resources': [{'format': fmt, 'url': url} for fmt, url in resources]}}
+            
+            cases = [
+                # La prima risorsa CSV con un indizio nell'URL, nell'ordine del pacchetto
+                (package(("JSON", "http://x/a.json"), ("CSV", "http://x/b.csv"), ("CSV", "http://x/c.csv")),
+                 "http://x/b.csv"),
+                # Un CSV senza indizio nell'URL viene saltato
+                (package(("CSV", "http://x/pagina"), ("CSV", "http://x/get?accessType=DOWNLOAD")),
+                 "http://x/get?accessType=DOWNLOAD"),
+                # Formato e indizi senza distinzione di maiuscole, anche text/csv
+                (package(("csv", "http://x/D.CSV"),), "http://x/D.CSV"),
+                (package((" text/csv ", "http://x/e.csv"),), "http://x/e.csv"),
+                # Formato diverso o URL mancante: nessuna risorsa
+                (package(("XLS", "http://x/f.csv"), ("CSV", "")), None),
+                ({'result': {}}, None),
+            ]
+            for package_data, expected in cases:
+                found = DataService.find_csv_resource_url(package_data)
+                if found != expected:
+                    print(f"❌ {package_data}: {found} invece di {expected}")
+                    return False
+            return True
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
     def _test_incident_analyzer(self) -> bool:
         """Test IncidentAnalyzer"""
         try:
@@ -184,20 +312,312 @@ class UnifiedTestSuite(BaseTest):
         except Exception:
             return False
     
+    def _test_traffic_filter(self) -> bool:
+        """Test filtro traffico con valori mancanti, condizione sconosciuta e tipi nullable/Arrow"""
+        try:
+            import pandas as pd
+            from analyzer import IncidentAnalyzer
+            analyzer = IncidentAnalyzer()
+            
+            data = {
+                'Condizioni traffico': ['Intenso', None, 'Intenso', 'Normale', 'Intenso'],
+                'N. veicoli coinvolti': [3, 5, None, 4, 2],
+                'Note': [None, 'x', None, 'y', None]
+            }
+            for vehicles_type in ['Int32', 'int32[pyarrow]', 'float64']:
+                for traffic_type in [object, 'category', 'string[pyarrow]']:
+                    df = pd.DataFrame(data).astype({'N. veicoli coinvolti': vehicles_type,
+                                                    'Condizioni traffico': traffic_type})
+                    label = f"{traffic_type}/{vehicles_type}"
+                    
+                    # Traffico mancante e veicoli mancanti non passano il filtro
+                    result = analyzer.filter_traffic_conditions('Intenso', 2, df=df)
+                    if list(result.index) != [0] or 'Note' in result.columns:
+                        print(f"❌ {label}: righe {list(result.index)}, colonne {list(result.columns)}")
+                        return False
+                    if list(analyzer.filter_traffic_conditions('Intenso', 1, df=df).index) != [0, 4]:
+                        print(f"❌ {label}: soglia veicoli non rispettata")
+                        return False
+                    # Condizione assente dai dati: risultato vuoto, senza errori
+                    if not analyzer.filter_traffic_conditions('Sconosciuto', 2, df=df).empty:
+                        print(f"❌ {label}: condizione sconosciuta non vuota")
+                        return False
+            return True
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
     def _test_ckan_api_service(self) -> bool:
         """Test CkanApiService struttura"""
         try:
-            from services import CkanApiService
+            import requests
+            from services import CkanApiService, SESSION
             service = CkanApiService()
-            return hasattr(service, 'get_package_list')
+            if not hasattr(service, 'get_package_list'):
+                return False
+            
+            # La sessione condivisa non appartiene all'istanza: close non deve chiuderla
+            closed = []
+            shared_close = SESSION.close
+            SESSION.close = lambda: closed.append('shared')
+            try:
+                with CkanApiService():
+                    pass
+            finally:
+                SESSION.close = shared_close
+            
+            # Una sessione fornita invece viene chiusa all'uscita dal contesto
+            custom = requests.Session()
+            custom.close = lambda: closed.append('custom')
+            with CkanApiService(session=custom):
+                pass
+            return closed == ['custom']
         except Exception:
             return False
     
+    def _test_dataset_schema_fallback(self) -> bool:
+        """Test schema non corrispondente: al massimo un nuovo download, senza schema"""
+        try:
+            import pandas as pd
+            import services
+            from services import DataService
+            
+            csv = FakeResponse(b"Latitudine;Condizioni traffico\nn.d.;Intenso\n45.1;Normale\n")
+            cases = [
+                {'dtype': {'Latitudine': 'float32'}}, # Valori di un altro tipo
+                {'usecols': ['Latitudine', 'Longitudine']}, # Colonna mancante
+            ]
+            for schema in cases:
+                with patched_attribute(services, 'SESSION', FakeSession(csv)) as session:
+                    df = DataService.get_dataframe_from_url("http://test/data.csv", **schema)
+                if df is None or len(df) != 2 or len(session.calls) != 2:
+                    print(f"❌ {schema}: {len(session.calls)} download, risultato {df}")
+                    return False
+                # Stessa famiglia di tipi del percorso pyarrow, anche se il file è stato riletto con il parser C
+                if services._CSV_ENGINE == "pyarrow" and not all(isinstance(t, pd.ArrowDtype) for t in df.dtypes):
+                    print(f"❌ {schema}: tipi non Arrow dopo la rilettura {dict(df.dtypes)}")
+                    return False
+            
+            # Schema corretto: un solo download
+            with patched_attribute(services, 'SESSION', FakeSession(csv)) as session:
+                df = DataService.get_dataframe_from_url("http://test/data.csv",
+                                                        dtype={'Condizioni traffico': 'category'})
+            return len(session.calls) == 1 and df['Condizioni traffico'].dtype == 'category'
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_package_list_cache(self) -> bool:
+        """Test TTL della lista pacchetti, richiesta condizionale (304), errore di rete e --refresh"""
+        try:
+            import time
+            import requests
+            from main import OpenDataAnalyzer
+            from services import CkanApiService
+            from config import PACKAGE_LIST_FILE, PACKAGE_LIST_META_FILE, PACKAGE_LIST_MAX_AGE
+            
+            def analyzer_with(session, refresh=False):
+                app = OpenDataAnalyzer(refresh=refresh)
+                app.ckan_service = CkanApiService(session=session)
+                return app
+            
+            with temporary_directory() as temp_dir, working_directory(temp_dir):
+                app = analyzer_with(FakeSession(FakeResponse(status_code=500)))
+                saved_list = {'result': ['incidenti-stradali']}
+                app.file_manager.save_json(saved_list, PACKAGE_LIST_FILE)
+                
+                # 1. Meta recente: nessuna richiesta
+                app.file_manager.save_json({'fetched_at': time.time(), 'validators': {'ETag': '"v1"'}},
+                                           PACKAGE_LIST_META_FILE)
+                if not app._fetch_and_save_packages() or app.ckan_service._session.calls:
+                    print("❌ Meta recente: richiesta inviata")
+                    return False
+                
+                # 2. Meta scaduta: If-None-Match inviato, il 304 riusa il file e riscrive la meta
+                stale_at = time.time() - PACKAGE_LIST_MAX_AGE - 1
+                app.file_manager.save_json({'fetched_at': stale_at, 'validators': {'ETag': '"v1"'}},
+                                           PACKAGE_LIST_META_FILE)
+                app = analyzer_with(FakeSession(FakeResponse(status_code=304)))
+                if not app._fetch_and_save_packages():
+                    return False
+                calls = app.ckan_service._session.calls
+                if len(calls) != 1 or calls[0][1]['headers'].get('If-None-Match') != '"v1"':
+                    print(f"❌ Richiesta condizionale errata: {calls}")
+                    return False
+                meta = app.file_manager.load_json(PACKAGE_LIST_META_FILE)
+                if meta['fetched_at'] <= stale_at or meta['validators'] != {'ETag': '"v1"'}:
+                    print(f"❌ Meta non riscritta dopo il 304: {meta}")
+                    return False
+                if app.file_manager.load_json(PACKAGE_LIST_FILE) != saved_list:
+                    return False
+                
+                # 3. Errore di rete: (True, None, {}) e nessun salvataggio
+                service = CkanApiService(session=FakeSession(requests.ConnectionError("offline")))
+                if service.get_package_list_if_modified({'ETag': '"v1"'}) != (True, None, {}):
+                    return False
+                
+                # 4. --refresh: la meta recente è ignorata, richiesta non condizionale e nuovi validatori salvati
+                app = analyzer_with(FakeSession(FakeResponse(b'{"result": ["nuovo"]}', headers={'ETag': '"v2"'})),
+                                    refresh=True)
+                if not app._fetch_and_save_packages():
+                    return False
+                calls = app.ckan_service._session.calls
+                if len(calls) != 1 or calls[0][1]['headers']:
+                    print(f"❌ --refresh: richiesta errata {calls}")
+                    return False
+                return (app.file_manager.load_json(PACKAGE_LIST_FILE) == {'result': ['nuovo']}
+                        and app.file_manager.load_json(PACKAGE_LIST_META_FILE)['validators'] == {'ETag': '"v2"'})
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_package_details_prefetch(self) -> bool:
+        """Test prefetch dei dettagli: una package_search per tutti, nessuna nuova richiesta, errori non stampati"""
+        try:
+            import requests
+            from main import OpenDataAnalyzer
+            from services import CkanApiService
+            
+            names = ['incidenti-2023', 'incidenti-2024']
+            details = FakeResponse(b'{"success": true, "result": {"count": 1, "results": '
+                                   b'[{"id": "a1", "name": "incidenti-2024", "resources": []}]}}')
+            
+            def analyzer_with(session):
+                app = OpenDataAnalyzer()
+                app.ckan_service = CkanApiService(session=session)
+                app.ui.get_package_selection = lambda packages: packages[-1]
+                return app
+            
+            with temporary_directory() as temp_dir, working_directory(temp_dir):
+                # Dettagli già scaricati in background: nessuna nuova richiesta
+                app = analyzer_with(FakeSession(details))
+                if app._select_package(names) != 'incidenti-2024':
+                    return False
+                app._prefetch.result()
+                calls = app.ckan_service._session.calls
+                if len(calls) != 1 or not all(name in calls[0][1]['params']['fq'] for name in names):
+                    print(f"❌ Prefetch non raggruppato in una package_search: {calls}")
+                    return False
+                package_data = app._get_package_details('incidenti-2024')
+                if package_data.get('result', {}).get('name') != 'incidenti-2024':
+                    print(f"❌ Dettagli errati: {package_data}")
+                    return False
+                if len(app.ckan_service._session.calls) != 1:
+                    print(f"❌ Richiesta ripetuta: {app.ckan_service._session.calls}")
+                    return False
+                
+                # Errore di rete: il prefetch non stampa nulla, la richiesta del pacchetto scelto lo segnala
+                app = analyzer_with(FakeSession(requests.ConnectionError("offline")))
+                _, output = capture_function_output(lambda: (app._select_package(names), app._prefetch.result()))
+                if output:
+                    print(f"❌ Output del prefetch: {output!r}")
+                    return False
+                _, output = capture_function_output(app._get_package_details, 'incidenti-2024')
+                return "offline" in output
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_ui_input_attempts(self) -> bool:
+        """Test richieste all'utente: nuovo tentativo, troppi errori e stdin chiuso terminano con codice 2"""
+        try:
+            import builtins
+            from ui import UserInterface
+            from config import INPUT_MAX_ATTEMPTS
+            
+            def scripted_input(answers):
+                # input finto: restituisce le risposte in ordine (EOFError viene sollevata) e conta le chiamate
+                calls = []
+                def fake_input(prompt=""):
+                    calls.append(prompt)
+                    answer = answers[len(calls) - 1]
+                    if isinstance(answer, BaseException):
+                        raise answer
+                    return answer
+                return fake_input, calls
+            
+            def exit_code(function, answers):
+                fake_input, calls = scripted_input(answers)
+                with patched_attribute(builtins, 'input', fake_input):
+                    try:
+                        function()
+                    except SystemExit as e:
+                        return e.code, len(calls)
+                return None, len(calls)
+            
+            # Risposte non valide seguite da una valida
+            cases = [
+                (UserInterface.get_keyword_input, ["  ", " incidenti "], "incidenti"),
+                (lambda: UserInterface.confirm_action("Procedere?"), ["forse", "Si"], True),
+                (lambda: UserInterface.get_package_selection(["a", "b"]), ["c", "b"], "b"),
+                (UserInterface.get_manual_csv_url, ["ftp://x", "https://x/d.csv"], "https://x/d.csv"),
+            ]
+            for function, answers, expected in cases:
+                fake_input, calls = scripted_input(answers)
+                with patched_attribute(builtins, 'input', fake_input):
+                    if function() != expected or len(calls) != 2:
+                        print(f"❌ Risposte {answers}: atteso {expected!r}")
+                        return False
+            
+            # Troppi tentativi non validi: uscita con codice 2 dopo INPUT_MAX_ATTEMPTS richieste
+            if exit_code(UserInterface.get_keyword_input, [""] * INPUT_MAX_ATTEMPTS) != (2, INPUT_MAX_ATTEMPTS):
+                print("❌ Tentativi esauriti senza SystemExit(2)")
+                return False
+            
+            # stdin chiuso: uscita immediata con codice 2
+            return exit_code(lambda: UserInterface.confirm_action("Procedere?"), [EOFError()]) == (2, 1)
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
+    def _test_incidents_map(self) -> bool:
+        """Test mappa: un marker per posizione con conteggio nel popup, heatmap pesata oltre la soglia"""
+        try:
+            import folium
+            import pandas as pd
+            import analyzer
+            from analyzer import IncidentAnalyzer
+            from folium.plugins import HeatMap
+            
+            # Due incidenti nello stesso punto, uno isolato, uno senza coordinate
+            df = pd.DataFrame({
+                'Latitudine': [45.1, 45.1, 45.2, None],
+                'Longitudine': [9.1, 9.1, 9.2, 9.3]
+            }, index=[10, 11, 12, 13])
+            
+            def build_layer():
+                incidents_map = folium.Map()
+                if not IncidentAnalyzer().create_incidents_map(df, incidents_map=incidents_map, layer_name="Test"):
+                    return None
+                return next(child for child in incidents_map._children.values()
+                            if isinstance(child, folium.FeatureGroup))
+            
+            layer = build_layer()
+            popups = {}
+            for marker in layer._children.values():
+                popup = next(child for child in marker._children.values() if isinstance(child, folium.Popup))
+                text = ''.join(html.data for html in popup.html._children.values())
+                popups[tuple(round(value, 4) for value in marker.location)] = text
+            if popups != {(45.1, 9.1): "2 accidents", (45.2, 9.2): "Accident 12"}:
+                print(f"❌ Marker inattesi: {popups}")
+                return False
+            
+            # Oltre MAP_HEATMAP_THRESHOLD posizioni: una sola heatmap, pesata con il numero di incidenti
+            with patched_attribute(analyzer, 'MAP_HEATMAP_THRESHOLD', 1):
+                layer = build_layer()
+            children = list(layer._children.values())
+            if len(children) != 1 or not isinstance(children[0], HeatMap):
+                print(f"❌ Heatmap attesa: {children}")
+                return False
+            weights = sorted((round(lat, 4), weight) for lat, _, weight in children[0].data)
+            return weights == [(45.1, 2), (45.2, 1)]
+        except Exception as e:
+            print(f"❌ Errore: {e}")
+            return False
+    
     def run_integration_tests(self) -> bool:
         """Esegue test di integrazione end-to-end"""
-        print("\n" + "="*60)
-        print("🚀 FASE 4: TEST INTEGRAZIONE")
-        print("="*60)
+        self._print_phase_header("🚀 FASE 4: TEST INTEGRAZIONE")
         
         integration_tests = [
             ("Workflow Completo", self._test_complete_workflow),
@@ -205,7 +625,8 @@ class UnifiedTestSuite(BaseTest):
             ("Validazione Output", self._test_output_validation),
         ]
         
-        return self.run_tests(integration_tests)
+        # Test indipendenti come nella fase funzionale
+        return self.run_tests(integration_tests, max_workers=TEST_MAX_WORKERS)
     
     def _test_complete_workflow(self) -> bool:
         """Test workflow completo simulato"""
@@ -259,8 +680,7 @@ class UnifiedTestSuite(BaseTest):
     
     def run_all_tests(self) -> bool:
         """Esegue tutti i test in sequenza"""
-        print("🎯 AVVIO SUITE UNIFICATA DI TEST")
-        print("="*80)
+        sys.stdout.write(f"🎯 AVVIO SUITE UNIFICATA DI TEST\n{SEPARATOR_REPORT}\n")
         
         # Setup ambiente
         setup_python_path()
@@ -293,24 +713,28 @@ class UnifiedTestSuite(BaseTest):
     
     def _print_final_report(self, results: Dict[str, bool], all_passed: bool):
         """Stampa report finale unificato"""
-        print("\n" + "="*80)
-        print("📊 REPORT FINALE SUITE UNIFICATA")
-        print("="*80)
+        # Il report è composto riga per riga e scritto con una sola operazione
+        lines = [
+            "\n" + SEPARATOR_REPORT,
+            "📊 REPORT FINALE SUITE UNIFICATA",
+            SEPARATOR_REPORT
+        ]
         
         for phase, result in results.items():
             status = "✅ PASS" if result else "❌ FAIL"
-            print(f"{phase:20} {status}")
+            lines.append(f"{phase:20} {status}")
         
-        print("\n" + "="*80)
+        lines.append("\n" + SEPARATOR_REPORT)
         if all_passed:
-            print("🎉 SUCCESSO: Tutti i test sono stati superati!")
-            print("✨ Il progetto AnalisiOpenData è completamente funzionante")
-            print("🚀 Pronto per l'uso in produzione")
+            lines.append("🎉 SUCCESSO: Tutti i test sono stati superati!")
+            lines.append("✨ Il progetto AnalisiOpenData è completamente funzionante")
+            lines.append("🚀 Pronto per l'uso in produzione")
         else:
-            print("⚠️  ATTENZIONE: Alcuni test sono falliti")
-            print("🔧 Rivedere le componenti segnalate")
+            lines.append("⚠️  ATTENZIONE: Alcuni test sono falliti")
+            lines.append("🔧 Rivedere le componenti segnalate")
         
-        print("="*80)
+        lines.append(SEPARATOR_REPORT)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
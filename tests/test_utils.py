@@ -6,38 +6,69 @@ Contiene funzioni di supporto riutilizzabili per eliminare duplicazioni.
 
 import os
 import sys
+import io
+import importlib.util
+import atexit
 import shutil
 import tempfile
-import pandas as pd
-from typing import Any, Dict, List, Optional, Tuple
-from contextlib import contextmanager
+import threading
+from collections import Counter # Confronto multinsieme: conta anche i duplicati
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+from contextlib import contextmanager, redirect_stdout, suppress
+from test_config import TEST_TMPFS_DIR
+
+if TYPE_CHECKING:
+    import pandas as pd # Importato in create_sample_dataframe, l'unica funzione che lo usa
+
+# Percorso assoluto di src, calcolato una sola volta
+_SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+_path_ready = False # True dopo la prima chiamata di setup_python_path
 
 # Aggiungi il percorso src al PYTHONPATH per i test
 def setup_python_path():
     """
     Aggiunge la directory src al PYTHONPATH per permettere le importazioni.
-    Deve essere chiamata all'inizio di ogni test.
+    Deve essere chiamata all'inizio di ogni test: dopo la prima volta non fa nulla.
     """
-    src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
-    if src_path not in sys.path:
-        sys.path.insert(0, src_path)
+    global _path_ready
+    if _path_ready:
+        return
+    if _SRC_PATH not in sys.path:
+        sys.path.insert(0, _SRC_PATH)
+    _path_ready = True
+
+# Radice temporanea condivisa da tutti i test della sessione, creata alla prima richiesta
+_session_temp_root: Optional[str] = None
+_session_temp_lock = threading.Lock()
+
+def _get_session_temp_root() -> str:
+    """
+    Restituisce la directory temporanea della sessione, creandola una sola volta
+    in TEST_TMPFS_DIR se disponibile e rimuovendola all'uscita dell'interprete.
+    """
+    global _session_temp_root
+    with _session_temp_lock:
+        if _session_temp_root is None:
+            try:
+                _session_temp_root = tempfile.mkdtemp(prefix="analisi_opendata_test_", dir=TEST_TMPFS_DIR)
+            except OSError:
+                _session_temp_root = tempfile.mkdtemp(prefix="analisi_opendata_test_")
+            atexit.register(shutil.rmtree, _session_temp_root, ignore_errors=True)
+        return _session_temp_root
 
 @contextmanager
 def temporary_directory():
     """
-    Context manager per creare una directory temporanea che viene automaticamente pulita.
+    Context manager che fornisce una sottodirectory temporanea della radice di sessione.
+    Le sottodirectory vengono rimosse tutte insieme a fine sessione, non a ogni test.
     
     Usage:
         with temporary_directory() as temp_dir:
             # Usa temp_dir per operazioni temporanee
             pass
-        # Directory automaticamente rimossa
+        # Directory rimossa all'uscita del processo di test
     """
-    temp_dir = tempfile.mkdtemp(prefix="analisi_opendata_test_")
-    try:
-        yield temp_dir
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    yield tempfile.mkdtemp(dir=_get_session_temp_root())
 
 @contextmanager
 def temporary_file(suffix: str = ""):
@@ -63,6 +94,47 @@ def temporary_file(suffix: str = ""):
         except OSError:
             pass
 
+@contextmanager
+def temporary_fd(suffix: str = ""):
+    """
+    Come temporary_file, ma restituisce anche il descrittore già aperto da mkstemp,
+    così il test può scriverci (os.write, os.fdopen) senza riaprire il file.
+    Il descrittore può essere chiuso anche dal test; nei test paralleli è meglio
+    os.fdopen(fd, closefd=False), perché il numero di un fd chiuso può essere riassegnato.
+    
+    Args:
+        suffix: Estensione del file (es. ".json", ".csv")
+        
+    Usage:
+        with temporary_fd(".csv") as (fd, temp_path):
+            os.write(fd, b"...")
+        # Descrittore chiuso e file rimosso
+    """
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix="analisi_opendata_test_")
+    try:
+        yield fd, temp_path
+    finally:
+        with suppress(OSError): # Già chiuso dal test
+            os.close(fd)
+        with suppress(OSError):
+            os.unlink(temp_path)
+
+def module_available(module_name: str) -> bool:
+    """
+    Verifica che un modulo sia installato/trovabile senza eseguirne il codice.
+    
+    Args:
+        module_name: Nome del modulo (anche puntato, es. "pyarrow.csv")
+        
+    Returns:
+        True se il modulo può essere importato
+    """
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        # Pacchetto padre mancante o modulo senza specifica
+        return False
+
 def safe_import(module_name: str) -> Optional[Any]:
     """
     Importa un modulo in modo sicuro, restituendo None se l'import fallisce.
@@ -73,15 +145,32 @@ def safe_import(module_name: str) -> Optional[Any]:
     Returns:
         Il modulo importato o None se l'import fallisce
     """
+    if not module_available(module_name):
+        print(f"❌ Modulo {module_name} non trovato")
+        return None
     try:
         return __import__(module_name)
     except ImportError as e:
         print(f"❌ Impossibile importare {module_name}: {e}")
         return None
 
+def has_all_attributes(module: Any, required_attributes: Iterable[str]) -> bool:
+    """
+    Verifica che un modulo abbia tutti gli attributi richiesti, fermandosi al primo mancante.
+    
+    Args:
+        module: Il modulo da verificare
+        required_attributes: Nomi degli attributi richiesti
+        
+    Returns:
+        True se tutti gli attributi sono presenti
+    """
+    return all(hasattr(module, attr) for attr in required_attributes)
+
 def verify_module_attributes(module: Any, required_attributes: List[str]) -> Tuple[bool, List[str]]:
     """
     Verifica che un modulo abbia tutti gli attributi richiesti.
+    Controlla sempre tutta la lista per elencare i mancanti: se serve solo l'esito usare has_all_attributes.
     
     Args:
         module: Il modulo da verificare
@@ -97,9 +186,14 @@ def verify_module_attributes(module: Any, required_attributes: List[str]) -> Tup
     
     return len(missing) == 0, missing
 
-def create_sample_dataframe(data: Optional[Dict[str, List[Any]]] = None) -> pd.DataFrame:
+# DataFrame di esempio predefinito, costruito una sola volta e condiviso tra i test
+_default_sample_df: Optional["pd.DataFrame"] = None
+
+def create_sample_dataframe(data: Optional[Dict[str, List[Any]]] = None) -> "pd.DataFrame":
     """
     Crea un DataFrame di esempio per i test.
+    Con i dati predefiniti restituisce una copia superficiale dell'istanza condivisa: con il
+    copy-on-write di pandas costa O(1) e le modifiche di un test non arrivano agli altri.
     
     Args:
         data: Dati personalizzati o None per usare dati predefiniti
@@ -107,28 +201,31 @@ def create_sample_dataframe(data: Optional[Dict[str, List[Any]]] = None) -> pd.D
     Returns:
         DataFrame di esempio
     """
-    if data is None:
-        data = {
+    global _default_sample_df
+    import pandas as pd # Import ritardato: caricare test_utils non richiede pandas
+    if data is not None:
+        return pd.DataFrame(data)
+    
+    if _default_sample_df is None:
+        _default_sample_df = pd.DataFrame({
             "col1": [1, 2, 3, 4],
             "col2": ["a", "b", "c", "d"],
             "col3": [1.1, 2.2, 3.3, 4.4]
-        }
-    
-    return pd.DataFrame(data)
+        })
+    return _default_sample_df.copy(deep=False)
 
-def validate_file_operations(file_manager, temp_dir: str) -> bool:
+def validate_json_operations(file_manager, temp_dir: str) -> bool:
     """
-    Testa le operazioni base del FileManager in modo standardizzato.
+    Testa salvataggio e caricamento JSON del FileManager.
     
     Args:
         file_manager: Istanza del FileManager da testare
         temp_dir: Directory temporanea per i test
         
     Returns:
-        True se tutte le operazioni riescono, False altrimenti
+        True se le operazioni riescono, False altrimenti
     """
     try:
-        # Test JSON
         test_data = {"test": "data", "numbers": [1, 2, 3]}
         
         # Salva JSON
@@ -143,22 +240,71 @@ def validate_file_operations(file_manager, temp_dir: str) -> bool:
             print("❌ Fallimento caricamento JSON")
             return False
         
-        # Test DataFrame
-        df = create_sample_dataframe()
+        return True
         
-        csv_success = file_manager.save_dataframe_csv(df, "test.csv", temp_dir)
-        excel_success = file_manager.save_dataframe_excel(df, "test.xlsx", temp_dir)
+    except Exception as e:
+        print(f"❌ Errore durante test JSON: {e}")
+        return False
+
+def validate_csv_operations(file_manager, temp_dir: str) -> bool:
+    """
+    Testa il salvataggio CSV di un DataFrame con il FileManager.
+    
+    Args:
+        file_manager: Istanza del FileManager da testare
+        temp_dir: Directory temporanea per i test
         
-        if not (csv_success and excel_success):
-            print("❌ Fallimento salvataggio DataFrame")
+    Returns:
+        True se il salvataggio riesce, False altrimenti
+    """
+    try:
+        if not file_manager.save_dataframe_csv(create_sample_dataframe(), "test.csv", temp_dir):
+            print("❌ Fallimento salvataggio CSV")
             return False
+        return True
+        
+    except Exception as e:
+        print(f"❌ Errore durante test CSV: {e}")
+        return False
+
+def validate_excel_operations(file_manager, temp_dir: str) -> bool:
+    """
+    Testa il salvataggio Excel di un DataFrame con il FileManager.
+    Separato dagli altri test perché openpyxl è lento da caricare e da scrivere.
+    
+    Args:
+        file_manager: Istanza del FileManager da testare
+        temp_dir: Directory temporanea per i test
         
+    Returns:
+        True se il salvataggio riesce, False altrimenti
+    """
+    try:
+        if not file_manager.save_dataframe_excel(create_sample_dataframe(), "test.xlsx", temp_dir):
+            print("❌ Fallimento salvataggio Excel")
+            return False
         return True
         
     except Exception as e:
-        print(f"❌ Errore durante test file operations: {e}")
+        print(f"❌ Errore durante test Excel: {e}")
         return False
 
+def validate_file_operations(file_manager, temp_dir: str, include_excel: bool = False) -> bool:
+    """
+    Testa le operazioni base del FileManager in modo standardizzato.
+    
+    Args:
+        file_manager: Istanza del FileManager da testare
+        temp_dir: Directory temporanea per i test
+        include_excel: True per verificare anche il salvataggio Excel (lento)
+        
+    Returns:
+        True se tutte le operazioni riescono, False altrimenti
+    """
+    return (validate_json_operations(file_manager, temp_dir)
+            and validate_csv_operations(file_manager, temp_dir)
+            and (not include_excel or validate_excel_operations(file_manager, temp_dir)))
+
 def test_class_instantiation(class_type: type, *args, **kwargs) -> Tuple[bool, Optional[Any], Optional[str]]:
     """
     Testa l'istanziazione di una classe in modo sicuro.
@@ -177,6 +323,83 @@ def test_class_instantiation(class_type: type, *args, **kwargs) -> Tuple[bool, O
     except Exception as e:
         return False, None, str(e)
 
+class FakeResponse:
+    """
+    Risposta HTTP finta per i test senza rete: supporta content, headers, raw in streaming,
+    raise_for_status e l'uso come context manager (come requests.Response).
+    """
+    
+    def __init__(self, content: bytes = b"", status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.raw = io.BytesIO(content)
+    
+    def json(self) -> Any:
+        import json
+        return json.loads(self.content)
+    
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            import requests # Import ritardato: solo i test HTTP ne hanno bisogno
+            raise requests.HTTPError(f"{self.status_code} Error")
+    
+    def close(self) -> None:
+        pass
+    
+    def __enter__(self) -> "FakeResponse":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+class FakeSession:
+    """
+    Sessione HTTP finta: restituisce le risposte indicate nell'ordine (un'eccezione viene sollevata)
+    e registra le chiamate in calls come tuple (url, kwargs).
+    """
+    
+    def __init__(self, *responses: Any):
+        self.responses = list(responses)
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+    
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.calls.append((url, kwargs))
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, BaseException):
+            raise response
+        # Ogni chiamata riceve un corpo nuovo, anche quando la stessa risposta viene ripetuta
+        return FakeResponse(response.content, response.status_code, response.headers)
+    
+    def close(self) -> None:
+        pass
+
+@contextmanager
+def working_directory(path: str):
+    """
+    Esegue il blocco con path come directory di lavoro (i percorsi di config sono relativi, es. ./data).
+    Cambia lo stato dell'intero processo: i test che lo usano vanno eseguiti in sequenza.
+    """
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+
+@contextmanager
+def patched_attribute(target: Any, name: str, value: Any):
+    """
+    Sostituisce temporaneamente un attributo (es. services.SESSION), ripristinandolo all'uscita.
+    I test che lo usano vanno eseguiti in sequenza, non in parallelo.
+    """
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield value
+    finally:
+        setattr(target, name, original)
+
 def compare_lists_ignore_order(list1: List[Any], list2: List[Any]) -> bool:
     """
     Confronta due liste ignorando l'ordine degli elementi.
@@ -186,9 +409,12 @@ def compare_lists_ignore_order(list1: List[Any], list2: List[Any]) -> bool:
         list2: Seconda lista
         
     Returns:
-        True se le liste contengono gli stessi elementi
+        True se le liste contengono gli stessi elementi, con le stesse ripetizioni
     """
-    return set(list1) == set(list2)
+    # Lunghezze diverse: non possono avere gli stessi elementi, nessun hashing necessario
+    if len(list1) != len(list2):
+        return False
+    return Counter(list1) == Counter(list2)
 
 def format_test_header(test_name: str) -> str:
     """
@@ -259,9 +485,6 @@ def capture_function_output(func, *args, **kwargs) -> Tuple[Any, str]:
     Returns:
         Tupla (risultato_funzione, output_catturato)
     """
-    import io
-    from contextlib import redirect_stdout
-    
     captured_output = io.StringIO()
     with redirect_stdout(captured_output):
         result = func(*args, **kwargs)